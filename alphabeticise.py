@@ -1,53 +1,138 @@
 import argparse as arg
+import filecmp
 import os
+import shutil
+import sys
+import tempfile
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from io import TextIOWrapper
 import get_line_list
 
-parser = arg.ArgumentParser(description="Organise domain names under each header alphabetically")
+def get_args() -> arg.Namespace:
+    parser = arg.ArgumentParser(description="Organise domain names under each header alphabetically")
 
-parser.add_argument("file")
+    parser.add_argument(
+        "paths", nargs="+",
+        help="Files to sort, or folders (such as Common SubPages Nuclear) to sort every file in")
+    parser.add_argument(
+        "-o", "--output",
+        help="Write the sorted list to this path instead of sorting the file in place. Only for a single file")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only check that the files are sorted, without writing anything. Exits with 1 if any file isn't")
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int, default=os.cpu_count(),
+        help="Number of files to sort or check at once. Default = the number of CPUs")
+    parser.add_argument(
+        "--memory-budget",
+        type=float, default=64,
+        help="MiB of entries to hold in memory for each file being sorted before spilling sorted runs to temporary files. Default = 64")
+    parser.add_argument(
+        "--temp-folder",
+        help="Where to put the sorted runs of sections that don't fit in --memory-budget. Default = the system temp folder")
 
-args = parser.parse_args()
+    return parser.parse_args()
 
-def main():
-    if args.file:
-        try:
-            file = open(args.file, "r", encoding="utf-8")
-            print(f"File {args.file} opened successfully")
-        except OSError:
-            print(f"Path {args.file} is not a valid file")
-            return 1
+def write_without_trailing_newlines(lines: Iterable[str], output_file: TextIOWrapper):
+    """
+    Write `lines`, holding back blank lines until another line follows so the file doesn't end with blank lines
+    """
+    pending_newlines = 0
+    line_ended = True
 
-        target_folder = os.path.dirname(args.file)
-        target_name = os.path.basename(args.file)
-        target_path = os.path.join(target_folder, "sorted_" + target_name)
-        with open(target_path, "x", encoding="utf-8") as write_file:
-            print(f"Writing to {target_path}")
+    for line in lines:
+        # a newline after a line without one ends that line, rather than being a blank line
+        if line == "\n" and line_ended:
+            pending_newlines += 1
+            continue
 
-            config = get_line_list.LineConfig()
+        if pending_newlines > 0:
+            output_file.write("\n" * pending_newlines)
+            pending_newlines = 0
 
-            while True:
-                lines = get_line_list.get_sorted_line_list(file, config)
-                #print(lines)
-                if len(lines) == 0:
-                    break
+        output_file.write(line)
+        line_ended = line.endswith("\n")
 
-                write_file.writelines(lines)
-                write_file.write("\n")
+def sort_file(path: str, target_path: str, memory_budget: int, temp_folder: str | None = None) -> bool:
+    """
+    Sort the entries under each header of `path` into `target_path`.
+    The result is written to a temporary file next to `target_path` and moved over it once complete, so `path` and `target_path` can be the same file.
+    A file that is already sorted is left untouched, so its modification time doesn't trigger a rebuild
 
-            file.close()
+    :return: Whether `target_path` was written
+    """
+    config = get_line_list.LineConfig()
+    target_folder = os.path.dirname(os.path.abspath(target_path))
 
-        with open(target_path, "r+", encoding="utf-8") as output_file:
-            last_newline_start_position = output_file.tell()
-            while True:
-                line = output_file.readline()
-                if line == '': # end of file
-                    break
+    with open(path, "r", encoding="utf-8") as file:
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=target_folder, prefix=".sorting_", delete=False) as write_file:
+            try:
+                write_without_trailing_newlines(
+                    get_line_list.iter_sorted_sections(file, config, memory_budget, temp_folder),
+                    write_file
+                )
+            except BaseException:
+                write_file.close()
+                os.remove(write_file.name)
+                raise
 
-                if not line == "\n": # line is not a newline
-                    last_newline_start_position = output_file.tell()
+    if os.path.isfile(target_path) and filecmp.cmp(write_file.name, target_path, shallow=False):
+        os.remove(write_file.name)
+        return False
 
-            output_file.seek(last_newline_start_position)
-            output_file.truncate() # remove trailing newlines?
+    shutil.copymode(path, write_file.name)
+    os.replace(write_file.name, target_path)
+    return True
+
+def check_file(path: str) -> tuple[int, str] | None:
+    """
+    :return: The first line of `path` that is out of order, see `get_line_list.find_unsorted_line`
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return get_line_list.find_unsorted_line(file, get_line_list.LineConfig())
+
+def main() -> int:
+    args = get_args()
+
+    paths = [path for input_path in args.paths for path in get_line_list.get_input_files(input_path)]
+    if len(paths) == 0:
+        print("No files to sort")
+        return 1
+
+    if args.output and (len(paths) != 1 or not os.path.isfile(args.paths[0])):
+        print("--output can only be used with a single file")
+        return 1
+
+    # a single file doesn't need the pool, which also keeps --output simple
+    executor = ProcessPoolExecutor(max_workers=args.jobs) if len(paths) > 1 and args.jobs > 1 else None
+    map_files = executor.map if executor is not None else map
+
+    try:
+        if args.check:
+            unsorted_count = 0
+            for path, unsorted_line in zip(paths, map_files(check_file, paths)):
+                if unsorted_line is not None:
+                    line_number, line = unsorted_line
+                    print(f"{path}:{line_number}: {line.strip()!r} is out of order")
+                    unsorted_count += 1
+
+            print(f"{unsorted_count} of {len(paths)} files are not sorted" if unsorted_count > 0 else f"All {len(paths)} files are sorted")
+            return 1 if unsorted_count > 0 else 0
+
+        target_paths = [args.output] if args.output else paths
+        memory_budgets = [int(args.memory_budget * (1 << 20))] * len(paths)
+        temp_folders = [args.temp_folder] * len(paths)
+
+        for target_path, written in zip(target_paths, map_files(sort_file, paths, target_paths, memory_budgets, temp_folders)):
+            print(f"Sorted {target_path}" if written else f"{target_path} is already sorted")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Synthetic source trees shaped like `Common/`, `SubPages/` and `Nuclear/`, for benchmarking
+
+Usage: python benchmarks/corpus.py OUTPUT_FOLDER [--entries N] [--headers N] [--subpages N] [--domain-sections N]
+"""
+import argparse as arg
+import json
+import os
+import random
+from dataclasses import dataclass, asdict
+
+TLDS = ["com", "ai", "net", "org", "io", "art", "co.uk", "app", "xyz", "de"]
+SUBPAGE_SITES = ["reddit.com/r/", "pinterest.com/", "instagram.com/", "youtube.com/@", "amazon.com/", "misc.example/"]
+SYLLABLES = ["ai", "art", "gen", "dream", "pix", "neo", "diff", "mid", "lab", "ly", "io", "sta", "ble", "ver", "so", "ra"]
+
+@dataclass
+class CorpusConfig:
+    """
+    :param int entries: Total number of entry lines across every generated file
+    :param int headers: Number of `! //` sections each list is split into
+    :param int subpages: Number of `SubPages/` files
+    :param int domain_sections: Number of sections using a `! domains=[...]` header
+    :param int domains_per_section: Number of domains listed in each `! domains=[...]` header
+    :param float subpage_share: Share of the entries that go into `SubPages/`
+    :param float nuclear_share: Share of the entries that go into `Nuclear/`
+    :param int seed: Seed for the random names, so a corpus can be regenerated exactly
+    """
+    entries: int = 10_000
+    headers: int = 50
+    subpages: int = 9
+    domain_sections: int = 2
+    domains_per_section: int = 2
+    subpage_share: float = 0.15
+    nuclear_share: float = 0.05
+    seed: int = 0
+
+def random_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))) + str(rng.randint(0, 999))
+
+def write_header_file(path: str, title: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"! Title: {title} ({{engine}})\n")
+        f.write("! Expires: 1 day\n")
+        f.write("! Description: Synthetic benchmark list\n")
+        f.write("!\n")
+
+def write_list_file(path: str, entries: int, headers: int, rng: random.Random, entry_factory) -> int:
+    """
+    Stream `entries` lines split over `headers` sections into `path`, without holding them in memory
+
+    :return: The number of lines written
+    """
+    headers = max(1, min(headers, entries))
+    lines_written = 0
+
+    with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        for header in range(headers):
+            f.write(f"! // Section {header}\n")
+            f.write("! Synthetic description comment\n")
+            lines_written += 2
+
+            # spread the remainder over the first sections
+            section_entries = entries // headers + (1 if header < entries % headers else 0)
+            f.writelines(entry_factory(rng) for _ in range(section_entries))
+            f.write("\n")
+            lines_written += section_entries + 1
+
+    return lines_written
+
+def generate_corpus(output_folder: str, config: CorpusConfig) -> dict:
+    """
+    Write a synthetic `Common/`, `SubPages/`, `Nuclear/` and `Elements/` tree under `output_folder`
+
+    :return: The folders and line counts of the generated tree
+    """
+    rng = random.Random(config.seed)
+
+    folders = {
+        name: os.path.join(output_folder, name)
+        for name in ("Common", "SubPages", "Nuclear", "Elements")
+    }
+    for folder in folders.values():
+        os.makedirs(folder, exist_ok=True)
+
+    subpage_entries = int(config.entries * config.subpage_share) if config.subpages > 0 else 0
+    nuclear_entries = int(config.entries * config.nuclear_share)
+    common_entries = config.entries - subpage_entries - nuclear_entries
+
+    domain_entry = lambda rng: f"{random_name(rng)}.{rng.choice(TLDS)}\n"
+
+    lines = 0
+    write_header_file(os.path.join(folders["Common"], "_header.txt"), "Synthetic Blocklist")
+    lines += 4
+    lines += write_list_file(os.path.join(folders["Common"], "list.txt"), common_entries, config.headers, rng, domain_entry)
+
+    remaining = subpage_entries
+    for i in range(config.subpages):
+        site = SUBPAGE_SITES[i % len(SUBPAGE_SITES)]
+        file_entries = remaining // (config.subpages - i)
+        remaining -= file_entries
+
+        path = os.path.join(folders["SubPages"], f"subpage_{i}.txt")
+        subpage_entry = lambda rng, site=site: f"{site}{random_name(rng)}\n"
+
+        if i < config.domain_sections:
+            # subpages shared across several domains, like twitter.com/ and x.com/
+            domains = [f"{random_name(rng)}.com/" for _ in range(config.domains_per_section)]
+            with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+                f.write(f"! // Section shared by {len(domains)} domains\n")
+                f.write(f"! domains={json.dumps(domains)}\n")
+                f.writelines(f"{random_name(rng)}\n" for _ in range(file_entries))
+            lines += file_entries + 2
+        else:
+            lines += write_list_file(path, file_entries, max(1, config.headers // max(1, config.subpages)), rng, subpage_entry)
+
+    write_header_file(os.path.join(folders["Nuclear"], "_header.txt"), "Synthetic Nuclear Blocklist")
+    lines += 4
+    lines += write_list_file(os.path.join(folders["Nuclear"], "list_nuclear.txt"), nuclear_entries, max(1, config.headers // 10), rng, domain_entry)
+
+    with open(os.path.join(folders["Elements"], "elements.txt"), "w", encoding="utf-8") as f:
+        f.write("! // Synthetic elements\n")
+        f.write("example.com##.ai-overview:remove()\n")
+    lines += 2
+
+    return {
+        "folders": folders,
+        "lines": lines,
+        "config": asdict(config),
+    }
+
+def add_corpus_arguments(parser: arg.ArgumentParser):
+    defaults = CorpusConfig()
+    parser.add_argument("--entries", type=int, default=defaults.entries, help="Total number of entries to generate")
+    parser.add_argument("--headers", type=int, default=defaults.headers, help="Number of `! //` sections per list")
+    parser.add_argument("--subpages", type=int, default=defaults.subpages, help="Number of SubPages files")
+    parser.add_argument("--domain-sections", type=int, default=defaults.domain_sections, help="Number of sections with a `! domains=[...]` header")
+    parser.add_argument("--domains-per-section", type=int, default=defaults.domains_per_section, help="Domains listed in each `! domains=[...]` header")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+def get_corpus_config(args: arg.Namespace) -> CorpusConfig:
+    return CorpusConfig(
+        entries=args.entries,
+        headers=args.headers,
+        subpages=args.subpages,
+        domain_sections=args.domain_sections,
+        domains_per_section=args.domains_per_section,
+        seed=args.seed,
+    )
+
+def main():
+    parser = arg.ArgumentParser(description="Generate a synthetic source tree for benchmarking")
+    parser.add_argument("output_folder")
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.output_folder, get_corpus_config(args))
+    print(f"Generated {corpus['lines']:,} lines under {args.output_folder}")
+
+if __name__ == "__main__":
+    main()
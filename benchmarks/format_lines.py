@@ -0,0 +1,70 @@
+"""
+Microbenchmark for line formatting: `list_generator.format_line` called per line,
+against a `list_generator.LineRenderer` compiled once and formatting whole sections
+
+Usage: python benchmarks/format_lines.py [--lines N] [--repeat N]
+"""
+import argparse as arg
+import gc
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import export_formats
+import get_line_list
+import list_generator
+
+# every format of the targets a default build exports, keyed by engine
+FORMATS = {
+    format_options.engine: format_options
+    for target in export_formats.load_targets(os.path.join(REPO_ROOT, "formats.toml"))
+    if target.enabled
+    for format_options in target.formats
+}
+
+def load_lines(folders: list[str], line_count: int) -> list[str]:
+    config = get_line_list.LineConfig(expand_domains=True)
+    lines = []
+    for folder in folders:
+        for path in list_generator.get_files_sorted(folder):
+            for section in get_line_list.parse_file(path, config):
+                lines.extend(section.header_lines + section.lines)
+
+    # repeat the real lists until there are enough lines
+    repeats = line_count // len(lines) + 1
+    return (lines * repeats)[:line_count]
+
+def best_time(function, repeat: int) -> float:
+    times = []
+    gc.disable() # as timeit does, so collections don't land on one side
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return min(times)
+
+def main():
+    parser = arg.ArgumentParser(description="Compare per-line formatting against compiled renderers")
+    parser.add_argument("--lines", type=int, default=200_000, help="Number of lines to format per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement, the best is reported")
+    args = parser.parse_args()
+
+    lines = load_lines([os.path.join(REPO_ROOT, "Common"), os.path.join(REPO_ROOT, "SubPages")], args.lines)
+
+    print(f"{'format':<14}{'format_line (lines/s)':>24}{'LineRenderer (lines/s)':>26}{'speedup':>10}")
+    for name, format_options in FORMATS.items():
+        renderer = list_generator.LineRenderer(format_options)
+
+        before = best_time(lambda: [list_generator.format_line(line, format_options) for line in lines], args.repeat)
+        after = best_time(lambda: renderer.format_lines(lines), args.repeat)
+
+        print(f"{name:<14}{len(lines) / before:>24,.0f}{len(lines) / after:>26,.0f}{before / after:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
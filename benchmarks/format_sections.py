@@ -0,0 +1,132 @@
+"""
+Benchmark for formatting large sections: `list_generator.LineRenderer.format_lines` joined into a string,
+against the bulk `format_section`, on a synthetic corpus with few, large sections.
+With --verify, checks instead that `format_section` matches `format_line` on random sections and format options,
+and exits with 1 on the first mismatch
+
+Usage: python benchmarks/format_sections.py [--entries N] [--headers N] [--repeat N]
+       python benchmarks/format_sections.py --verify [--cases N] [--seed N]
+"""
+import argparse as arg
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import get_line_list
+import list_generator
+from corpus import generate_corpus, add_corpus_arguments, get_corpus_config
+from format_lines import FORMATS, best_time
+
+def load_sections(folders: dict[str, str]) -> list[list[str]]:
+    config = get_line_list.LineConfig(expand_domains=True)
+    return [
+        section.header_lines + section.lines
+        for name in ("Common", "SubPages")
+        for path in list_generator.get_files_sorted(folders[name])
+        for section in get_line_list.parse_file(path, config)
+    ]
+
+# Lines for --verify, weighted towards plain entries so most sections take the bulk path.
+# The rest are the lines the bulk path has to hand to `format_line`: comments, blank lines, surrounding whitespace
+# (including characters `str.rstrip` strips besides spaces), leading periods and `/` for hosts, and text that looks like a template
+VERIFY_ENTRIES = ["example.com", "ai-art.net", "sub.domain.co.uk", "xn--bcher-kva.de", "a", "0.0.0.0"]
+VERIFY_LINES = [
+    "\n", "  \n", "\t\n", "! comment\n", "!\n", "! // Header\n", "! Title: {engine}\n", "!! double\n", "# hash\n",
+    ".example.com", "..dots.com", " .space.com", "example.com/", "example.com/path", "/path", "example.com  ", "example.com\t",
+    " example.com", "example.com\r", "example.com\x0b", "example.com\x1c", "example.com\u3000", "\u3000example.com",
+    "{url}.com", "{engine}.com", "regex.(com)+", "quote\"d.com", "back\\slash.com", "www.example.com", "example.com!",
+]
+VERIFY_TEMPLATES = [
+    'google.com##a[href*="{url}"]:upward(2):remove()', "*://*{url}*", "0.0.0.0 {url}", "0.0.0.0 www{url}", "||{url}^",
+    "(\\.|^){url}$", "{url}", "  {url}  ", "{url} {url}", "no url", "", "! {url}",
+]
+
+def get_random_format(rng: random.Random) -> list_generator.FormatOptions:
+    return list_generator.FormatOptions(
+        rng.choice(VERIFY_TEMPLATES), rng.choice(["google", "hosts", "{url}"]),
+        comment_replacement=rng.choice(["!", "#", "//", ""]),
+        apply_prefix=rng.random() < 0.3, line_prefix_to_apply=rng.choice([".", "", "www."]),
+        apply_suffix=rng.random() < 0.3, line_suffix_to_apply=rng.choice(["/", "", "^"]),
+        hosts_mode=rng.random() < 0.3,
+        escape_regex=rng.random() < 0.1,
+    )
+
+def get_random_section(rng: random.Random) -> list[str]:
+    lines = []
+    for _ in range(rng.choice([0, 1, 2, 5, 20, 100])):
+        if rng.random() < 0.7:
+            lines.append(rng.choice(VERIFY_ENTRIES) + "\n")
+        else:
+            line = rng.choice(VERIFY_LINES)
+            lines.append(line if line.endswith("\n") else line + "\n")
+
+    # only the last line of a file can be missing its line break
+    if len(lines) > 0 and rng.random() < 0.1:
+        lines[-1] = lines[-1].removesuffix("\n")
+
+    return lines
+
+def verify(cases: int, seed: int) -> int:
+    """
+    Format random sections with `format_section`, `format_lines` and `format_line`, starting with the default formats
+
+    :return: 1 if any of them differ, otherwise 0
+    """
+    rng = random.Random(seed)
+    default_formats = list(FORMATS.values())
+
+    for case in range(cases):
+        format_options = default_formats[case] if case < len(default_formats) else get_random_format(rng)
+        renderer = list_generator.LineRenderer(format_options)
+        lines = get_random_section(rng)
+
+        expected = "".join(list_generator.format_line(line, format_options) for line in lines)
+        results = {"format_section": renderer.format_section(lines), "format_lines": "".join(renderer.format_lines(lines))}
+
+        for name, result in results.items():
+            if result != expected:
+                print(f"{name} doesn't match format_line in case {case}:\n  {format_options!r}\n  lines: {lines!r}\n  expected: {expected!r}\n  got: {result!r}")
+                return 1
+
+    print(f"format_section and format_lines matched format_line in {cases:,} cases")
+    return 0
+
+def main() -> int:
+    parser = arg.ArgumentParser(description="Compare line by line and bulk formatting of large sections")
+    add_corpus_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the best is reported")
+    parser.add_argument("--verify", action="store_true", help="Check that the bulk and line by line formatting give the same text, instead of timing them")
+    parser.add_argument("--cases", type=int, default=30_000, help="Random sections to check with --verify")
+    parser.set_defaults(entries=1_000_000, headers=4)
+    args = parser.parse_args()
+
+    if args.verify:
+        return verify(args.cases, args.seed)
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        corpus = generate_corpus(temp_folder, get_corpus_config(args))
+        sections = load_sections(corpus["folders"])
+
+    line_count = sum(len(lines) for lines in sections)
+    print(f"{line_count:,} lines in {len(sections)} sections")
+
+    print(f"{'format':<14}{'format_lines (lines/s)':>26}{'format_section (lines/s)':>28}{'speedup':>10}")
+    for name, format_options in FORMATS.items():
+        renderer = list_generator.LineRenderer(format_options)
+
+        for lines in sections:
+            if renderer.format_section(lines) != "".join(renderer.format_lines(lines)):
+                raise AssertionError(f"format_section doesn't match format_lines for {name}")
+
+        before = best_time(lambda: ["".join(renderer.format_lines(lines)) for lines in sections], args.repeat)
+        after = best_time(lambda: [renderer.format_section(lines) for lines in sections], args.repeat)
+
+        print(f"{name:<14}{line_count / before:>26,.0f}{line_count / after:>28,.0f}{before / after:>9.2f}x")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
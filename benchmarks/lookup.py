@@ -0,0 +1,86 @@
+"""
+Benchmark for `domain_lookup`: compiling a synthetic corpus into a lookup file, loading it, and matching batches of urls
+
+Usage: python benchmarks/lookup.py [--entries N] [--urls N] [--hit-rate F] [--repeat N]
+"""
+import argparse as arg
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import domain_lookup
+import get_line_list
+from corpus import generate_corpus, add_corpus_arguments, get_corpus_config, random_name, TLDS
+from format_lines import best_time
+
+def get_entries(input_file_paths: list[str]) -> list[str]:
+    config = get_line_list.LineConfig(expand_domains=True)
+    return [
+        line.strip().strip("./")
+        for path in input_file_paths
+        for _, lines in get_line_list.iter_entries(get_line_list.iter_file_lines(path), config)
+        for line in lines
+    ]
+
+def make_urls(entries: list[str], count: int, hit_rate: float, seed: int) -> list[str]:
+    """
+    Urls in the shapes a search results page links to: listed entries under a `www.` subdomain or with extra path segments,
+    mixed with random unlisted hosts
+    """
+    rng = random.Random(seed)
+    urls = []
+
+    for _ in range(count):
+        if rng.random() < hit_rate:
+            entry = rng.choice(entries)
+            prefix = "www." if "/" not in entry and rng.random() < 0.5 else ""
+            urls.append(f"https://{prefix}{entry}/{random_name(rng)}")
+        else:
+            urls.append(f"https://{random_name(rng)}.{rng.choice(TLDS)}/{random_name(rng)}?q={random_name(rng)}")
+
+    return urls
+
+def main():
+    parser = arg.ArgumentParser(description="Benchmark building, loading and querying a compiled domain lookup file")
+    add_corpus_arguments(parser)
+    parser.add_argument("--urls", type=int, default=200_000, help="Number of urls to match per run")
+    parser.add_argument("--hit-rate", type=float, default=0.2, help="Share of the urls that are on the list")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the best is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        corpus = generate_corpus(os.path.join(temp_folder, "corpus"), get_corpus_config(args))
+        input_file_paths = [
+            path
+            for name in ("Common", "SubPages", "Nuclear")
+            for path in get_line_list.get_input_files(corpus["folders"][name])
+        ]
+        lookup_path = os.path.join(temp_folder, "blocklist.domains")
+
+        def build():
+            builder = domain_lookup.DomainSetBuilder()
+            builder.add_files(input_file_paths)
+            builder.save(lookup_path)
+
+        build_seconds = best_time(build, args.repeat)
+        load_seconds = best_time(lambda: domain_lookup.DomainSet.load(lookup_path).close(), args.repeat)
+
+        entries = get_entries(input_file_paths)
+        urls = make_urls(entries, args.urls, args.hit_rate, args.seed)
+
+        with domain_lookup.DomainSet.load(lookup_path) as domain_set:
+            match_seconds = best_time(lambda: [domain_set.match(url) for url in urls], args.repeat)
+            match_many_seconds = best_time(lambda: domain_set.match_many(urls), args.repeat)
+            hits = sum(result is not None for result in domain_set.match_many(urls))
+
+        print(f"entries:     {len(entries):,} ({os.path.getsize(lookup_path):,} bytes compiled)")
+        print(f"build:       {build_seconds * 1000:.1f} ms")
+        print(f"load:        {load_seconds * 1000:.3f} ms")
+        print(f"match:       {len(urls) / match_seconds:,.0f} urls/s")
+        print(f"match_many:  {len(urls) / match_many_seconds:,.0f} urls/s ({hits:,} of {len(urls):,} blocked)")
+
+if __name__ == "__main__":
+    main()
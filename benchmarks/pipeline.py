@@ -0,0 +1,210 @@
+"""
+Benchmark for the whole list pipeline on a synthetic corpus.
+Times the parse, sort, render and write stages separately and stores the results as JSON,
+so runs on different commits can be compared
+
+Usage:
+    python benchmarks/pipeline.py [--entries N] [--repeat N] [--sort-memory-budget MiB] [--output results.json]
+    python benchmarks/pipeline.py --entries 1000000 --compare benchmarks/results/<older run>.json
+"""
+import argparse as arg
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import get_line_list
+import list_generator
+from corpus import generate_corpus, add_corpus_arguments, get_corpus_config
+from format_lines import FORMATS
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def measure(function, repeat: int, trace_memory: bool) -> tuple[float, int | None, object]:
+    """
+    :return: The best wall time over `repeat` runs, the peak traced allocation of one extra run (if `trace_memory`), and the result of the last run
+    """
+    times = []
+    result = None
+
+    gc.collect()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return min(times), peak, result
+
+def run_benchmark(folders: dict[str, str], output_folder: str, repeat: int, trace_memory: bool, sort_memory_budget: int) -> dict:
+    input_paths = []
+    for name in ("Common", "SubPages", "Nuclear"):
+        input_paths.extend(list_generator.get_files_sorted(folders[name]))
+
+    stages = {}
+
+    def add_stage(name: str, seconds: float, peak: int | None, lines: int, output_bytes: int | None = None):
+        stages[name] = {
+            "seconds": seconds,
+            "lines": lines,
+            "lines_per_second": lines / seconds if seconds > 0 else None,
+            "bytes": output_bytes,
+            "peak_memory_bytes": peak,
+        }
+
+    # parse
+    seconds, peak, parsed_files = measure(lambda: list_generator.parse_files(input_paths), repeat, trace_memory)
+    parsed_lines = sum(
+        len(section.header_lines) + len(section.lines)
+        for sections in parsed_files.values()
+        for section in sections
+    )
+    add_stage("parse", seconds, peak, parsed_lines)
+
+    # sort, the same way alphabeticise.py does: streamed through the external sorter, spilling runs past the memory budget.
+    # The files are read beforehand, so only the sorting (and its temporary runs) is timed
+    sort_config = get_line_list.LineConfig()
+    file_lines = []
+    for path in input_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            file_lines.append(f.readlines())
+
+    sort_lines = sum(
+        len(section.lines)
+        for lines in file_lines
+        for section in get_line_list.get_sections(lines, sort_config)
+    )
+
+    def sort_all() -> int:
+        sorted_lines = 0
+        for lines in file_lines:
+            for _ in get_line_list.iter_sorted_sections(lines, sort_config, sort_memory_budget):
+                sorted_lines += 1
+        return sorted_lines
+
+    seconds, peak, _ = measure(sort_all, repeat, trace_memory)
+    add_stage("sort", seconds, peak, sort_lines)
+
+    # render every benchmark format
+    def render_all() -> dict[str, list[str]]:
+        return {
+            name: list_generator.render_formatted_lines(parsed_files, format_options)[0]
+            for name, format_options in FORMATS.items()
+        }
+
+    seconds, peak, rendered = measure(render_all, repeat, trace_memory)
+    add_stage("render", seconds, peak, parsed_lines * len(FORMATS))
+
+    # write
+    def write_all() -> int:
+        written = 0
+        for name, parts in rendered.items():
+            path = os.path.join(output_folder, name + ".txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(parts)
+            written += os.path.getsize(path)
+        return written
+
+    seconds, peak, written_bytes = measure(write_all, repeat, trace_memory)
+    add_stage("write", seconds, peak, parsed_lines * len(FORMATS), written_bytes)
+
+    return stages
+
+def print_stages(stages: dict, baseline: dict | None = None):
+    header = f"{'stage':<8}{'seconds':>10}{'lines/s':>16}{'peak MiB':>10}"
+    if baseline is not None:
+        header += f"{'vs baseline':>14}"
+    print(header)
+
+    for name, stage in stages.items():
+        peak = "-" if stage["peak_memory_bytes"] is None else f"{stage['peak_memory_bytes'] / (1 << 20):.1f}"
+        lines_per_second = "-" if stage["lines_per_second"] is None else f"{stage['lines_per_second']:,.0f}"
+        row = f"{name:<8}{stage['seconds']:>10.4f}{lines_per_second:>16}{peak:>10}"
+
+        if baseline is not None and baseline["stages"].get(name, {}).get("lines_per_second") and stage["lines_per_second"]:
+            # throughput ratio, above 1 is faster than the baseline
+            row += f"{stage['lines_per_second'] / baseline['stages'][name]['lines_per_second']:>13.2f}x"
+        print(row)
+
+def main():
+    parser = arg.ArgumentParser(description="Benchmark the parse, sort, render and write stages on a synthetic corpus")
+    add_corpus_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage, the best is reported")
+    parser.add_argument("--sort-memory-budget", type=float, default=64, help="MiB of entries the sort stage holds per file before spilling sorted runs, like alphabeticise.py --memory-budget. Default = 64")
+    parser.add_argument("--no-memory", action="store_false", dest="trace_memory", help="Skip the extra traced run used to measure peak memory")
+    parser.add_argument("--corpus", help="Benchmark an existing source tree (containing Common/, SubPages/ and Nuclear/) instead of generating one")
+    parser.add_argument("-o", "--output", help="Where to store the JSON results. Default = benchmarks/results/<commit>-<entries>.json")
+    parser.add_argument("--compare", help="A previous JSON result to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        if args.corpus:
+            folders = {name: os.path.join(args.corpus, name) for name in ("Common", "SubPages", "Nuclear", "Elements")}
+            corpus = {"folders": folders, "config": {"path": args.corpus}}
+        else:
+            corpus = generate_corpus(os.path.join(temp_folder, "corpus"), get_corpus_config(args))
+
+        output_folder = os.path.join(temp_folder, "output")
+        os.makedirs(output_folder)
+
+        sort_memory_budget = int(args.sort_memory_budget * (1 << 20))
+        stages = run_benchmark(corpus["folders"], output_folder, args.repeat, args.trace_memory, sort_memory_budget)
+
+    commit = get_commit()
+    results = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": corpus["config"],
+        "sort_memory_budget": sort_memory_budget,
+        "stages": stages,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+        if baseline.get("corpus") != corpus["config"]:
+            print(f"Warning: {args.compare} was run on a different corpus, only the throughput is comparable")
+
+    print_stages(stages, baseline)
+    print(f"peak RSS: {results['peak_rss_bytes'] / (1 << 20):.1f} MiB")
+
+    output_path = args.output
+    if output_path is None:
+        entries = corpus["config"].get("entries", "corpus")
+        output_path = os.path.join(ROOT, "benchmarks", "results", f"{commit or 'unknown'}-{entries}.json")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output_path}")
+
+if __name__ == "__main__":
+    main()
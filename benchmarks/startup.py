@@ -0,0 +1,105 @@
+"""
+Startup budget for the pre-commit entry point: the import time and wall time of `python -m listgen` when nothing changed,
+next to `list_generator.py` doing the same no-op build.
+Exits with 1 if either measurement of `python -m listgen` is over its budget. CI runs it on every change to the code (.github/workflows/startup-budget.yml)
+
+Usage: python benchmarks/startup.py [--runs N] [--import-budget N] [--run-budget N]
+"""
+import argparse as arg
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def get_build_args(temp_folder: str) -> list[str]:
+    # the repository's own sources, with everything the build writes kept in `temp_folder`
+    return [
+        "--common-path", os.path.join(REPO_ROOT, "Common"),
+        "--subpage-path", os.path.join(REPO_ROOT, "SubPages"),
+        "--nuclear-path", os.path.join(REPO_ROOT, "Nuclear"),
+        "--element-path", os.path.join(REPO_ROOT, "Elements"),
+        "-o", os.path.join(temp_folder, "Export"),
+        "--cache-path", os.path.join(temp_folder, "cache.json"),
+    ]
+
+def run(command: list[str], temp_folder: str) -> subprocess.CompletedProcess:
+    environment = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    return subprocess.run(command, cwd=temp_folder, env=environment, capture_output=True, text=True, check=True)
+
+def get_import_time(command: list[str], temp_folder: str) -> float:
+    """
+    :return: The milliseconds `-X importtime` reports for the top level imports of `command`
+    """
+    result = run([sys.executable, "-X", "importtime", *command], temp_folder)
+
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "): # nested imports are counted in their parent
+            total += int(cumulative)
+
+    return total / 1000
+
+def get_run_time(command: list[str], temp_folder: str, runs: int) -> float:
+    """
+    :return: The best wall time of `command`, in milliseconds
+    """
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        run([sys.executable, *command], temp_folder)
+        best = min(best, time.perf_counter() - start)
+
+    return best * 1000
+
+def main() -> int:
+    parser = arg.ArgumentParser(description="Measure and enforce the no-op startup time of python -m listgen")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per wall time measurement, the best is reported")
+    parser.add_argument("--import-budget", type=float, default=25, help="Most milliseconds of imports allowed for a no-op run of python -m listgen")
+    parser.add_argument("--run-budget", type=float, default=60, help="Most milliseconds of wall time allowed for a no-op run of python -m listgen")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        build_args = get_build_args(temp_folder)
+        commands = {
+            "python -m listgen": ["-m", "listgen", *build_args],
+            "list_generator.py": [os.path.join(REPO_ROOT, "list_generator.py"), *build_args],
+        }
+
+        # the first run builds everything, after that both are no-ops
+        run([sys.executable, *commands["python -m listgen"]], temp_folder)
+        output = run([sys.executable, *commands["python -m listgen"]], temp_folder).stdout
+        if "Nothing changed" not in output:
+            print(f"python -m listgen didn't detect the finished build:\n{output}")
+            return 1
+
+        baseline = get_run_time(["-c", "pass"], temp_folder, args.runs)
+        print(f"{'python -c pass':<20}{'':>12}{baseline:>10.1f} ms run")
+
+        results = {}
+        for name, command in commands.items():
+            results[name] = (get_import_time(command, temp_folder), get_run_time(command, temp_folder, args.runs))
+            print(f"{name:<20}{results[name][0]:>9.1f} ms imports{results[name][1]:>10.1f} ms run")
+
+    import_time, run_time = results["python -m listgen"]
+    over_budget = []
+    if import_time > args.import_budget:
+        over_budget.append(f"imports took {import_time:.1f} ms, the budget is {args.import_budget:g} ms")
+    if run_time > args.run_budget:
+        over_budget.append(f"the run took {run_time:.1f} ms, the budget is {args.run_budget:g} ms")
+
+    if over_budget:
+        print("python -m listgen is over budget: " + ", ".join(over_budget))
+        return 1
+
+    print("python -m listgen is within budget")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
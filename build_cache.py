@@ -0,0 +1,223 @@
+from dataclasses import asdict
+from os import stat, replace
+from os.path import abspath, dirname, exists, isfile, join
+import hashlib
+import json
+import warnings
+import get_line_list
+import validate_entries
+
+CACHE_VERSION = 2
+
+# The modules that parse the source files and render the exports, next to this one. The cached sections and outputs are dropped when any of them changes
+GENERATOR_MODULES = ("list_generator.py", "get_line_list.py", "export_formats.py", "validate_entries.py", "release_artifacts.py", "output_writer.py", "build_cache.py")
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def hash_text(text: str) -> str:
+    return hash_bytes(text.encode("utf-8"))
+
+def get_code_hashes() -> dict[str, str]:
+    """
+    :return: The content hash of each of the `GENERATOR_MODULES`, keyed by file name
+    """
+    script_folder = dirname(abspath(__file__))
+    hashes = {}
+    for name in GENERATOR_MODULES:
+        with open(join(script_folder, name), "rb") as f:
+            hashes[name] = hash_bytes(f.read())
+
+    return hashes
+
+def get_section_digest(section: get_line_list.Section) -> str:
+    # the separator keeps a header line from hashing the same as an entry line
+    return hash_text("".join(section.header_lines) + "\0" + "".join(section.lines))
+
+class BuildCache:
+    """
+    A build manifest for `list_generator.py`, stored as JSON at `path`. With no `path` it is only kept in memory
+
+    Records the parsed sections of every source file (keyed by mtime, size and content hash),
+    and for every exported file the input hashes and format it was rendered from, along with the
+    length of each rendered section so unchanged sections can be copied out of the previous export.
+    All of it is for the generator code it was built with, and is dropped once that code changes
+    """
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self.code_hashes = get_code_hashes()
+        self.files: dict[str, dict] = {}
+        self.outputs: dict[str, dict] = {}
+
+        # the sections of each file parsed by this process, so long-running builds (--watch) don't rebuild them from the manifest
+        self.parsed_files: dict[str, list[get_line_list.Section]] = {}
+
+        # content hashes of the source files parsed during this run
+        self.file_hashes: dict[str, str] = {}
+
+        self.load()
+
+    def load(self):
+        if self.path is None or not isfile(self.path):
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            warnings.warn(f"Build cache {self.path} could not be read, rebuilding everything")
+            return
+
+        if manifest.get("version") != CACHE_VERSION or manifest.get("code") != self.code_hashes:
+            return
+
+        self.files = manifest.get("files", {})
+        self.outputs = manifest.get("outputs", {})
+
+    def save(self):
+        if self.path is None:
+            return
+
+        manifest = {
+            "version": CACHE_VERSION,
+            "code": self.code_hashes,
+            "files": self.files,
+            "outputs": self.outputs,
+        }
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+        replace(temp_path, self.path)
+
+    def parse_file(self, path: str, config: get_line_list.LineConfig, validator: validate_entries.EntryValidator | None = None) -> list[get_line_list.Section]:
+        """
+        Parse `path`, reusing the cached sections if the file (and `config`) haven't changed since the last run
+
+        :param EntryValidator validator: Parse with this instead, checking and normalising the entries.
+            The problems it found are cached with the sections, and added to it again when they're reused
+        """
+        file_stat = stat(path)
+        config_key = asdict(config)
+        if validator is not None:
+            config_key["validated"] = True
+        entry = self.files.get(path)
+
+        if entry is not None and entry["config"] != config_key:
+            entry = None
+
+        # Same mtime and size, trust the cached hash without reading the file
+        if entry is not None and entry["mtime_ns"] == file_stat.st_mtime_ns and entry["size"] == file_stat.st_size:
+            self.file_hashes[path] = entry["hash"]
+            if validator is not None:
+                validator.add_problems(path, entry["problems"])
+            if path not in self.parsed_files:
+                self.parsed_files[path] = [get_line_list.Section(*section) for section in entry["sections"]]
+            return self.parsed_files[path]
+
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hash_bytes(data)
+
+        problems = []
+        if entry is not None and entry["hash"] == digest: # touched but not changed
+            sections = [get_line_list.Section(*section) for section in entry["sections"]]
+            if validator is not None:
+                problems = entry["problems"]
+                validator.add_problems(path, problems)
+        elif validator is not None:
+            problem_count = len(validator.problems)
+            sections = validator.get_sections(path, get_line_list.iter_buffer_lines(data), config)
+            problems = [[problem.line_number, problem.kind, problem.message] for problem in validator.problems[problem_count:]]
+        else:
+            sections = get_line_list.get_sections(get_line_list.iter_buffer_lines(data), config)
+
+        self.files[path] = {
+            "mtime_ns": file_stat.st_mtime_ns,
+            "size": file_stat.st_size,
+            "hash": digest,
+            "config": config_key,
+            "sections": [[section.header_lines, section.lines, section.domains] for section in sections],
+        }
+        if validator is not None:
+            self.files[path]["problems"] = problems
+        self.file_hashes[path] = digest
+        self.parsed_files[path] = sections
+
+        return sections
+
+    def get_output_key(self, input_file_paths: list[str], format_key: dict, extra_lines: list[str] = []) -> dict:
+        """
+        :return: Everything an exported file depends on. The file is up to date if this matches the recorded key
+        """
+        return {
+            "inputs": [[path, self.file_hashes[path]] for path in input_file_paths if path in self.file_hashes],
+            "format": format_key,
+            "extra": hash_text("".join(extra_lines)),
+        }
+
+    def _matches_on_disk(self, output_path: str, record: dict) -> bool:
+        if not isfile(output_path):
+            return False
+
+        output_stat = stat(output_path)
+        return record["mtime_ns"] == output_stat.st_mtime_ns and record["size"] == output_stat.st_size
+
+    def is_up_to_date(self, output_path: str, key: dict) -> bool:
+        record = self.outputs.get(output_path)
+        if record is None or record["key"] != key:
+            return False
+
+        return self._matches_on_disk(output_path, record)
+
+    def get_reusable_chunks(self, output_path: str, format_key: dict) -> dict[str, str]:
+        """
+        Split the previous export back into its rendered sections
+
+        :return: The rendered text of each section, keyed by section digest. Empty if the export was rendered with a different format or has been edited since
+        """
+        record = self.outputs.get(output_path)
+        if record is None or record["key"]["format"] != format_key or not self._matches_on_disk(output_path, record):
+            return {}
+
+        with open(output_path, "r", encoding="utf-8") as f:
+            text = f.read()
+
+        chunks = {}
+        position = 0
+        for digest, length in record["chunks"]:
+            if digest is not None:
+                chunks[digest] = text[position:position + length]
+            position += length
+
+        return chunks
+
+    def record_output(self, output_path: str, key: dict, chunks: list[list] = []):
+        if not exists(output_path):
+            return
+
+        output_stat = stat(output_path)
+        self.outputs[output_path] = {
+            "key": key,
+            "mtime_ns": output_stat.st_mtime_ns,
+            "size": output_stat.st_size,
+            "chunks": chunks,
+        }
+
+    def get_compiled_key(self, input_file_paths: list[str], output_header: str) -> dict:
+        """
+        :return: The key for a compiled file, built from the recorded state of the exports it joins together
+        """
+        inputs = []
+        for path in input_file_paths:
+            record = self.outputs.get(path)
+            if record is None or not self._matches_on_disk(path, record):
+                inputs.append([path, None])
+            else:
+                inputs.append([path, record["mtime_ns"], record["size"]])
+
+        return {
+            "inputs": inputs,
+            "header": output_header,
+        }
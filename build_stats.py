@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+def get_peak_rss() -> int | None:
+    """
+    :return: The peak resident set size of this process in bytes, `None` where it can't be read
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB everywhere else
+    return peak if sys.platform == "darwin" else peak * 1024
+
+@dataclass
+class StageStats:
+    """
+    :param str name: The stage, such as `"parse"` or `"write"`
+    :param float seconds: Wall time spent in the stage. Calls running at the same time on different threads are added together
+    :param int calls: The number of times the stage was entered
+    :param int lines: Lines read or rendered by the stage
+    :param int bytes: Bytes the stage wrote to disk
+    :param int peak_rss: Peak resident set size of the process that ran the stage, when it last finished, in bytes
+    """
+    name: str
+    seconds: float = 0
+    calls: int = 0
+    lines: int = 0
+    bytes: int = 0
+    peak_rss: int | None = None
+
+class BuildStats:
+    """
+    Wall time, line and byte counts for each stage of a build, kept as totals per stage
+    and as a timeline of every call that can be saved in the Chrome trace format (for chrome://tracing or Perfetto)
+    """
+
+    def __init__(self, stage_names: list[str] = [], start_time: float | None = None):
+        """
+        :param list[str] stage_names: Stages to report in this order, even if they never run. Others are reported after them as they're first seen
+        :param float start_time: The `time.perf_counter()` the trace starts at, so stats from worker processes line up with the main process
+        """
+        self.stages: dict[str, StageStats] = {name: StageStats(name) for name in stage_names}
+        self.events: list[dict] = []
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self.lock = threading.Lock()
+
+    def get_stage(self, name: str) -> StageStats:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageStats(name)
+        return stage
+
+    @contextmanager
+    def stage(self, name: str, **trace_args):
+        """
+        Time the body of the `with` block as a call of the stage `name`.
+        `trace_args` are shown on the call in the trace
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            peak_rss = get_peak_rss()
+
+            with self.lock:
+                stage = self.get_stage(name)
+                stage.seconds += end - start
+                stage.calls += 1
+                stage.peak_rss = peak_rss
+
+                self.events.append({
+                    "name": name,
+                    "cat": "stage",
+                    "ph": "X",
+                    "ts": (start - self.start_time) * 1_000_000,
+                    "dur": (end - start) * 1_000_000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": trace_args,
+                })
+
+    def count(self, name: str, lines: int = 0, bytes: int = 0):
+        with self.lock:
+            stage = self.get_stage(name)
+            stage.lines += lines
+            stage.bytes += bytes
+
+    def merge(self, stages: dict[str, StageStats], events: list[dict]):
+        """
+        Add the `stages` and `events` of another `BuildStats`, such as one from a worker process
+        """
+        with self.lock:
+            for other in stages.values():
+                stage = self.get_stage(other.name)
+                stage.seconds += other.seconds
+                stage.calls += other.calls
+                stage.lines += other.lines
+                stage.bytes += other.bytes
+                if other.peak_rss is not None:
+                    stage.peak_rss = max(stage.peak_rss or 0, other.peak_rss)
+
+            self.events.extend(events)
+
+    def format_report(self) -> str:
+        rows = [f"{'stage':<10}{'seconds':>10}{'calls':>8}{'lines':>12}{'lines/s':>14}{'written':>14}{'peak RSS':>12}"]
+
+        for stage in self.stages.values():
+            lines_per_second = f"{stage.lines / stage.seconds:,.0f}" if stage.seconds > 0 and stage.lines > 0 else "-"
+            written = f"{stage.bytes / 1024:,.1f} KiB" if stage.bytes > 0 else "-"
+            peak_rss = f"{stage.peak_rss / (1 << 20):.1f} MiB" if stage.peak_rss is not None else "-"
+            lines = f"{stage.lines:,}" if stage.lines > 0 else "-"
+
+            rows.append(f"{stage.name:<10}{stage.seconds:>10.4f}{stage.calls:>8}{lines:>12}{lines_per_second:>14}{written:>14}{peak_rss:>12}")
+
+        rows.append(f"total     {time.perf_counter() - self.start_time:>10.4f}")
+        return "\n".join(rows)
+
+    def write_trace(self, path: str):
+        trace = {
+            "traceEvents": self.events,
+            "displayTimeUnit": "ms",
+        }
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f)
@@ -0,0 +1,391 @@
+import argparse as arg
+import mmap
+import os
+import struct
+import sys
+import zlib
+from collections.abc import Iterable
+import get_line_list
+
+# File layout, all little endian:
+#   header   magic, version, node count, edge count, path count, string table size
+#   nodes    first edge slot, edge slot count, first path slot, path slot count, flags
+#   edges    label offset, label length, child node
+#   paths    path offset, path length
+#   strings  the utf-8 labels and paths the edges and paths point into
+# Node 0 is the root, and the children of a node are the next label of the host from the right,
+# so `www.example.com` is found by walking `com` -> `example` -> `www`.
+# The edges and paths of each node form an open addressing hash table (crc32, linear probing)
+# with a power of two number of slots, so a lookup is a probe or two however many entries a node has.
+# Empty slots have a length of 0
+MAGIC = b"AIBL"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<4sIIIII")
+NODE = struct.Struct("<IIIII")
+EDGE = struct.Struct("<III")
+PATH = struct.Struct("<II")
+
+# set on a node when the whole domain (and every subdomain) is blocked
+NODE_BLOCKED = 1
+
+# characters that end a path segment, so `reddit.com/r/aiart` doesn't match `reddit.com/r/aiartists`
+PATH_BOUNDARIES = "/?#"
+
+def split_url(url: str) -> tuple[str, str]:
+    """
+    Split a url, or a bare `host/path` entry, into its host and the path after the host
+
+    :return: The lowercased host without port, credentials or trailing dot, and the path (with any query string) without the leading `/`, case kept
+    """
+    url = url.strip()
+
+    scheme_end = url.find("://")
+    if scheme_end != -1:
+        url = url[scheme_end + 3:]
+
+    host_end = len(url)
+    for boundary in PATH_BOUNDARIES:
+        position = url.find(boundary)
+        if position != -1 and position < host_end:
+            host_end = position
+
+    host = url[:host_end].rpartition("@")[2].partition(":")[0].strip(".").lower()
+    path = url[host_end:].removeprefix("/")
+
+    return host, path
+
+class _TrieNode:
+    __slots__ = ("children", "blocked", "paths")
+
+    def __init__(self):
+        self.children: dict[str, _TrieNode] = {}
+        self.blocked = False
+        self.paths: set[str] = set()
+
+class DomainSetBuilder:
+    """
+    Collects blocklist entries into a reversed-label trie of hosts, each with the subpage paths blocked on it,
+    and serialises it to the binary format read by `DomainSet`
+    """
+
+    def __init__(self):
+        self.root = _TrieNode()
+        self.entry_count = 0
+
+    def add(self, entry: str):
+        """
+        :param str entry: A source list entry, such as `example.com`, `.example.com/` or `reddit.com/r/aiart`
+        """
+        host, path = split_url(entry.strip().strip("."))
+        path = path.rstrip("/")
+        if host == "":
+            return
+
+        labels = host.split(".")
+        if "" in labels:
+            return
+
+        node = self.root
+        for label in reversed(labels):
+            child = node.children.get(label)
+            if child is None:
+                child = node.children[label] = _TrieNode()
+            node = child
+
+        if path == "":
+            node.blocked = True
+        else:
+            node.paths.add(path)
+
+        self.entry_count += 1
+
+    def add_files(self, input_file_paths: Iterable[str]):
+        """
+        Add every entry of the source files, with `! domains=[...]` sections expanded
+        """
+        config = get_line_list.LineConfig(expand_domains=True)
+
+        for path in input_file_paths:
+            for _, lines in get_line_list.iter_entries(get_line_list.iter_file_lines(path), config):
+                for line in lines:
+                    self.add(line)
+
+    def to_bytes(self) -> bytes:
+        nodes: list[_TrieNode] = [self.root]
+        strings = bytearray()
+        string_offsets: dict[bytes, int] = {}
+
+        def add_string(text: str) -> tuple[int, int]:
+            data = text.encode("utf-8")
+            offset = string_offsets.get(data)
+            if offset is None:
+                offset = string_offsets[data] = len(strings)
+                strings.extend(data)
+            return offset, len(data)
+
+        def add_table(records: list, items: list[tuple[str, tuple]], empty: tuple) -> tuple[int, int]:
+            """
+            Append a hash table of `items` (key, extra fields) to `records`
+
+            :return: The first slot and the number of slots
+            """
+            if len(items) == 0:
+                return len(records), 0
+
+            size = 1 << (len(items) * 2 - 1).bit_length() # at most half full
+            table = [empty] * size
+            for key, fields in items:
+                offset, length = add_string(key)
+                slot = zlib.crc32(key.encode("utf-8")) & (size - 1)
+                while table[slot][1] != 0:
+                    slot = (slot + 1) & (size - 1)
+                table[slot] = (offset, length, *fields)
+
+            first_slot = len(records)
+            records.extend(table)
+            return first_slot, size
+
+        # breadth first, so nodes are numbered as they're reached
+        node_records = []
+        edge_records = []
+        path_records = []
+        index = 0
+        while index < len(nodes):
+            node = nodes[index]
+            index += 1
+
+            children = []
+            for label, child in node.children.items():
+                children.append((label, (len(nodes),)))
+                nodes.append(child)
+
+            edges = add_table(edge_records, children, (0, 0, 0))
+            paths = add_table(path_records, [(path, ()) for path in sorted(node.paths)], (0, 0))
+
+            node_records.append((*edges, *paths, NODE_BLOCKED if node.blocked else 0))
+
+        data = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, len(node_records), len(edge_records), len(path_records), len(strings)))
+        for record in node_records:
+            data += NODE.pack(*record)
+        for record in edge_records:
+            data += EDGE.pack(*record)
+        for record in path_records:
+            data += PATH.pack(*record)
+        data += strings
+
+        return bytes(data)
+
+    def save(self, path: str):
+        data = self.to_bytes()
+
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+class DomainSet:
+    """
+    Membership lookups over a compiled blocklist, read straight out of the binary buffer (usually a memory map) without unpacking it first.
+    A host matches when it or a parent domain is listed, and a url also matches a listed path on its host or a parent domain,
+    when the url's path starts with it and continues with `/`, `?`, `#` or nothing
+    """
+
+    def __init__(self, buffer: bytes | mmap.mmap):
+        self.buffer = buffer
+        self._mmap = buffer if isinstance(buffer, mmap.mmap) else None
+
+        magic, version, node_count, edge_count, path_count, string_size = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a compiled blocklist")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled blocklist version {version}, expected {FORMAT_VERSION}")
+
+        self.node_count = node_count
+        self.nodes_start = HEADER.size
+        self.edges_start = self.nodes_start + node_count * NODE.size
+        self.paths_start = self.edges_start + edge_count * EDGE.size
+        self.strings_start = self.paths_start + path_count * PATH.size
+
+        if len(buffer) < self.strings_start + string_size:
+            raise ValueError("Compiled blocklist is truncated")
+
+    @classmethod
+    def load(cls, path: str) -> "DomainSet":
+        """
+        Memory-map a file written by `DomainSetBuilder.save`. Nothing is read until it is looked up
+        """
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def __enter__(self) -> "DomainSet":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def read_string(self, offset: int, length: int) -> bytes:
+        start = self.strings_start + offset
+        return self.buffer[start:start + length]
+
+    def _get_node(self, index: int) -> tuple[int, int, int, int, int]:
+        return NODE.unpack_from(self.buffer, self.nodes_start + index * NODE.size)
+
+    def _find_slot(self, start: int, record: struct.Struct, slot_count: int, key: bytes) -> int | None:
+        """
+        :return: The position of the record for `key` in the hash table of `slot_count` records at `start`, `None` if it isn't there
+        """
+        if slot_count == 0:
+            return None
+
+        buffer = self.buffer
+        strings_start = self.strings_start
+        mask = slot_count - 1
+        slot = zlib.crc32(key) & mask
+
+        while True:
+            position = start + slot * record.size
+            offset, length = record.unpack_from(buffer, position)[:2]
+            if length == 0:
+                return None
+            if length == len(key) and buffer[strings_start + offset:strings_start + offset + length] == key:
+                return position
+            slot = (slot + 1) & mask
+
+    def _find_child(self, node: tuple, label: bytes) -> int | None:
+        position = self._find_slot(self.edges_start + node[0] * EDGE.size, EDGE, node[1], label)
+        if position is None:
+            return None
+
+        return EDGE.unpack_from(self.buffer, position)[2]
+
+    def _has_path(self, node: tuple, path: bytes) -> bool:
+        return self._find_slot(self.paths_start + node[2] * PATH.size, PATH, node[3], path) is not None
+
+    def _match_path(self, node: tuple, path: str) -> str | None:
+        # every prefix of the path ending at a segment boundary, shortest first
+        for end in range(1, len(path) + 1):
+            if end < len(path) and path[end] not in PATH_BOUNDARIES:
+                continue
+
+            prefix = path[:end].rstrip("/")
+            if prefix != "" and self._has_path(node, prefix.encode("utf-8")):
+                return prefix
+
+        return None
+
+    def _walk(self, host: str, path: str) -> tuple[str | None, bool]:
+        """
+        :return: The matching entry, and whether a subpage entry was passed on the way (so the result depends on the path)
+        """
+        labels = host.split(".")
+        node = self._get_node(0)
+        has_paths = False
+
+        for depth in range(1, len(labels) + 1):
+            child = self._find_child(node, labels[-depth].encode("utf-8"))
+            if child is None:
+                return None, has_paths
+            node = self._get_node(child)
+
+            if node[4] & NODE_BLOCKED:
+                return ".".join(labels[-depth:]), has_paths
+
+            if node[3] > 0:
+                has_paths = True
+                matched_path = self._match_path(node, path)
+                if matched_path is not None:
+                    return ".".join(labels[-depth:]) + "/" + matched_path, has_paths
+
+        return None, has_paths
+
+    def match_host_path(self, host: str, path: str = "") -> str | None:
+        """
+        :return: The entry that blocks `host` and `path`, as `host` or `host/path`. `None` if nothing does
+        """
+        return self._walk(host, path)[0]
+
+    def match(self, url: str) -> str | None:
+        """
+        :param str url: A full url, or a bare host or `host/path`
+        :return: The entry that blocks `url`, `None` if it isn't blocked
+        """
+        return self._walk(*split_url(url))[0]
+
+    def __contains__(self, url: str) -> bool:
+        return self.match(url) is not None
+
+    def match_many(self, urls: Iterable[str]) -> list[str | None]:
+        """
+        `match` over a batch of urls. Hosts without subpage entries are only looked up once per batch
+
+        :return: The matching entry (or `None`) for each url, in order
+        """
+        host_results: dict[str, str | None] = {}
+        results = []
+
+        for url in urls:
+            host, path = split_url(url)
+
+            if host in host_results:
+                results.append(host_results[host])
+                continue
+
+            result, has_paths = self._walk(host, path)
+            if not has_paths:
+                host_results[host] = result
+            results.append(result)
+
+        return results
+
+def get_args() -> arg.Namespace:
+    parser = arg.ArgumentParser(description="Compile the source lists into a binary lookup file, and check urls against it")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Compile source lists into a lookup file")
+    build_parser.add_argument(
+        "paths", nargs="*", default=["Common", "SubPages"],
+        help="Files or folders to compile. Default = Common SubPages, add Nuclear to include the nuclear list")
+    build_parser.add_argument(
+        "-o", "--output", default="blocklist.domains",
+        help="The lookup file to write. Default = blocklist.domains")
+
+    match_parser = subparsers.add_parser("match", help="Check urls against a lookup file")
+    match_parser.add_argument("urls", nargs="*", help="Urls or hosts to check. Read from stdin, one per line, if none are given")
+    match_parser.add_argument(
+        "-d", "--domains", default="blocklist.domains",
+        help="The lookup file to check against. Default = blocklist.domains")
+
+    return parser.parse_args()
+
+def main() -> int:
+    args = get_args()
+
+    if args.command == "build":
+        builder = DomainSetBuilder()
+        for path in args.paths:
+            builder.add_files(get_line_list.get_input_files(path))
+
+        builder.save(args.output)
+        print(f"Compiled {builder.entry_count} entries into {args.output} ({os.path.getsize(args.output)} bytes)")
+        return 0
+
+    urls = args.urls if args.urls else [line.strip() for line in sys.stdin if line.strip() != ""]
+
+    blocked = False
+    with DomainSet.load(args.domains) as domain_set:
+        for url, entry in zip(urls, domain_set.match_many(urls)):
+            if entry is None:
+                print(f"{url}: not listed")
+            else:
+                print(f"{url}: blocked by {entry}")
+                blocked = True
+
+    return 1 if blocked else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import json
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class FormatOptions:
+    """
+    :param str line_format: The format to place the line contents into. `"{url}"` in this string gets replaced with the line contents
+    :param str engine: The engine that this line is being created for. Replaces `"{engine}"` in a string beginning with `header_prefix` or `comment_prefix`
+    :param str header_prefix: The prefix expected for a commented header line
+    :param str comment_prefix: The prefix expected for a commented line
+    :param str comment_replacement: The string to replace the comment prefix with. Use when the engine doesn't use the default comment character (`!`)
+
+    :param bool apply_prefix: Whether to check for and apply `line_prefix_to_apply`
+    :param bool apply_suffix: Whether to check for and apply `line_suffix_to_apply`
+
+    :param bool hosts_mode: Removes leading whitespace and periods, comments out lines that contain `/`
+    :param bool escape_regex: Escapes the line contents for a regular expression, for engines that take regex filters (such as Pi-hole)
+
+    :param int compact_rules: For uBlockOrigin cosmetic filters, group up to this many entries into one rule with `:is()`. `0` keeps one rule per entry
+    """
+    line_format: str
+    engine: str
+    header_prefix: str = "! //"
+    comment_prefix: str = "!"
+    comment_replacement: str = "!"
+    apply_prefix: bool = False
+    line_prefix_to_apply: str = ""
+    apply_suffix: bool = False
+    line_suffix_to_apply: str = ""
+
+    # extra handling for the hosts.txt format
+    hosts_mode: bool = False
+
+    escape_regex: bool = False
+
+    compact_rules: int = 0
+
+@dataclass
+class ExportTarget:
+    """
+    A group of exports rendered from the same sources, one for each of `formats`. See `formats.toml` for what each option does
+    """
+    name: str
+    file_name: str
+    formats: list[FormatOptions]
+    enabled: bool = True
+    sources: str = "list"
+    elements: bool = False
+    nuclear_engine: str | None = None
+    compact: bool = False
+    compiled_file_name: str | None = None
+    compiled_header: str = ""
+    nuclear_compiled_header: str | None = None
+
+SOURCES = ("common", "list")
+
+def load_targets(path: str) -> list[ExportTarget]:
+    """
+    Read the `[[targets]]` of a TOML config, or the `"targets"` of a JSON one (by the `.json` extension)
+
+    :raises ValueError: If the file can't be parsed, or a target or format has an unknown or missing option.
+        Also for a TOML config on Python 3.10, which doesn't have `tomllib`
+    """
+    if path.endswith(".json"):
+        with open(path, "rb") as f:
+            config = json.load(f)
+    else:
+        try:
+            import tomllib
+        except ModuleNotFoundError:
+            raise ValueError("Reading a TOML config needs Python 3.11 or newer (tomllib), use a .json config on older versions") from None
+
+        with open(path, "rb") as f:
+            config = tomllib.load(f)
+
+    targets = []
+    for entry in config.get("targets", []):
+        entry = dict(entry)
+        name = entry.get("name")
+
+        try:
+            formats = [FormatOptions(**format_entry) for format_entry in entry.pop("formats", [])]
+            target = ExportTarget(formats=formats, **entry)
+        except TypeError as e:
+            raise ValueError(f"Target {name!r}: {e}") from None
+
+        if target.sources not in SOURCES:
+            raise ValueError(f"Target {name!r}: sources must be one of {', '.join(SOURCES)}, not {target.sources!r}")
+
+        if len(target.formats) == 0:
+            raise ValueError(f"Target {name!r} has no formats")
+
+        if any(target.name == other.name for other in targets):
+            raise ValueError(f"Target {name!r} is defined twice")
+
+        targets.append(target)
+
+    return targets
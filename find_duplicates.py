@@ -0,0 +1,225 @@
+import argparse as arg
+import os
+import sys
+from dataclasses import dataclass
+import get_line_list
+
+@dataclass
+class Entry:
+    """
+    :param str path: The source file the entry is in
+    :param int line_number: The line of `path` the entry is on, starting at 1
+    :param str text: The entry with `! domains=[...]` expanded, without surrounding whitespace or periods, or a trailing `/`
+    :param int rank: The position of the list the entry came from. Entries are only redundant because of entries in the same or an earlier list,
+        as the later lists (like Nuclear) are optional additions to the earlier ones
+    """
+    path: str
+    line_number: int
+    text: str
+    rank: int = 0
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line_number}"
+
+@dataclass
+class Finding:
+    """
+    :param str kind: `"exact"` or `"case"` for a duplicate of `original`, `"subsumed"` if `original` is a parent domain or path prefix of `entry`
+    """
+    kind: str
+    entry: Entry
+    original: Entry
+
+    def __str__(self) -> str:
+        if self.kind == "subsumed":
+            return f"{self.entry}: '{self.entry.text}' is already covered by '{self.original.text}' ({self.original})"
+        if self.kind == "case":
+            return f"{self.entry}: '{self.entry.text}' is a case variant of '{self.original.text}' ({self.original})"
+        return f"{self.entry}: '{self.entry.text}' is a duplicate of {self.original}"
+
+def normalise_entry(line: str) -> str:
+    return line.strip().strip(" ./")
+
+def split_entry(text: str) -> tuple[str, str]:
+    """
+    :return: The lowercased host of the entry, and its path (without the leading `/`, case kept)
+    """
+    host, _, path = text.partition("/")
+    return host.lower(), path
+
+class EntryIndex:
+    """
+    Hash indexes over every entry, built in a single pass.
+    Each lookup is a dict access per domain label or path segment, so building and checking stays linear in the size of the lists
+    """
+
+    def __init__(self):
+        self.entries: list[Entry] = []
+        self.exact: dict[str, Entry] = {}
+        self.folded: dict[str, Entry] = {}
+
+        # whole-domain entries keyed by lowercased host, and subpage entries keyed by lowercased host and path
+        self.hosts: dict[str, Entry] = {}
+        self.paths: dict[tuple[str, str], Entry] = {}
+
+        self.findings: list[Finding] = []
+
+    def add(self, entry: Entry):
+        self.entries.append(entry)
+
+        original = self.exact.get(entry.text)
+        if original is not None:
+            self.findings.append(Finding("exact", entry, original))
+            return
+        self.exact[entry.text] = entry
+
+        folded_text = entry.text.lower()
+        original = self.folded.get(folded_text)
+        if original is not None:
+            self.findings.append(Finding("case", entry, original))
+            return
+        self.folded[folded_text] = entry
+
+        host, path = split_entry(entry.text)
+        if path == "":
+            self.hosts.setdefault(host, entry)
+        else:
+            self.paths.setdefault((host, path), entry)
+
+    def get_parent(self, entry: Entry) -> Entry | None:
+        """
+        :return: The entry that already blocks everything `entry` does: a parent domain, the same domain for a subpage, or a shorter path on the same domain
+        """
+        host, path = split_entry(entry.text)
+        labels = host.split(".")
+
+        # parent domains, or the domain itself for subpages
+        first_label = 0 if path != "" else 1
+        for i in range(first_label, len(labels) - 1):
+            parent = self.hosts.get(".".join(labels[i:]))
+            if parent is not None and parent is not entry and parent.rank <= entry.rank:
+                return parent
+
+        # shorter paths on the same domain, split at `/`
+        segments = path.split("/")
+        for i in range(1, len(segments)):
+            parent = self.paths.get((host, "/".join(segments[:i])))
+            if parent is not None and parent is not entry and parent.rank <= entry.rank:
+                return parent
+
+        return None
+
+    def find_subsumed(self):
+        duplicates = {id(finding.entry) for finding in self.findings}
+
+        for entry in self.entries:
+            if id(entry) in duplicates:
+                continue
+
+            parent = self.get_parent(entry)
+            if parent is not None:
+                self.findings.append(Finding("subsumed", entry, parent))
+
+def build_index(input_lists: list[list[str]]) -> EntryIndex:
+    """
+    :param list[list[str]] input_lists: The files of each list, in priority order
+    """
+    config = get_line_list.LineConfig(expand_domains=True)
+    index = EntryIndex()
+
+    for rank, input_file_paths in enumerate(input_lists):
+        for path in input_file_paths:
+            for line_number, lines in get_line_list.iter_entries(get_line_list.iter_file_lines(path), config):
+                for line in lines:
+                    text = normalise_entry(line)
+                    if text != "":
+                        index.add(Entry(path, line_number, text, rank))
+
+    index.find_subsumed()
+    return index
+
+def remove_findings(findings: list[Finding], kinds: set[str]) -> dict[str, int]:
+    """
+    Delete the source lines of every finding of a kind in `kinds`.
+    A line under `! domains=[...]` is only deleted when every domain it expands to is redundant
+
+    :return: The number of lines removed from each file
+    """
+    flagged: dict[tuple[str, int], int] = {}
+    for finding in findings:
+        if finding.kind in kinds:
+            key = (finding.entry.path, finding.entry.line_number)
+            flagged[key] = flagged.get(key, 0) + 1
+
+    config = get_line_list.LineConfig(expand_domains=True)
+    removed = {}
+
+    for path in sorted({path for path, _ in flagged}):
+        expansions = {
+            line_number: len(lines)
+            for line_number, lines in get_line_list.iter_entries(get_line_list.iter_file_lines(path), config)
+        }
+        remove_lines = {
+            line_number
+            for (flagged_path, line_number), count in flagged.items()
+            if flagged_path == path and count >= expansions.get(line_number, 0)
+        }
+        if len(remove_lines) == 0:
+            continue
+
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.writelines(
+                line for line_number, line in enumerate(lines, 1)
+                if line_number not in remove_lines
+            )
+        os.replace(temp_path, path)
+
+        removed[path] = len(remove_lines)
+
+    return removed
+
+def get_args() -> arg.Namespace:
+    parser = arg.ArgumentParser(description="Find entries that are duplicated, or already covered by a parent domain or path, across the source lists")
+
+    parser.add_argument(
+        "paths", nargs="*", default=["Common", "SubPages", "Nuclear"],
+        help='Files or folders to check, in priority order. The first occurrence of a duplicate is kept, and later lists never make earlier ones redundant. Default = Common SubPages Nuclear')
+    parser.add_argument(
+        "--remove", action="append", choices=["exact", "case", "subsumed"], default=[],
+        help="Delete the redundant lines of this kind from the source files. Can be repeated. "
+             "Note that hosts files don't block subdomains, so 'subsumed' entries may still be needed there")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Exit with status 1 if anything redundant is found")
+
+    return parser.parse_args()
+
+def main() -> int:
+    args = get_args()
+
+    index = build_index([get_line_list.get_input_files(path) for path in args.paths])
+
+    for finding in index.findings:
+        print(finding)
+
+    counts = {kind: 0 for kind in ("exact", "case", "subsumed")}
+    for finding in index.findings:
+        counts[finding.kind] += 1
+
+    print(f"Checked {len(index.entries)} entries: {counts['exact']} exact duplicates, {counts['case']} case variants, {counts['subsumed']} covered by a parent")
+
+    if args.remove:
+        for path, count in remove_findings(index.findings, set(args.remove)).items():
+            print(f"Removed {count} lines from {path}")
+
+    if args.check and len(index.findings) > 0:
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,14 @@
-from io import TextIOWrapper
+from collections.abc import Iterable, Iterator
 from typing import overload
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from os import fstat, remove, walk
+from os.path import isdir, isfile, join
+import heapq
 import json
+import mmap
+import sys
+import tempfile
+import warnings
 
 @dataclass
 class LineConfig:
@@ -13,93 +20,250 @@ class LineConfig:
     apply_url_suffix: bool = False
     expand_domains: bool = False
 
+@dataclass
+class Section:
+    """
+    A single block of a source list, as yielded by `iter_section_chunks`
 
-def get_line_list(file: TextIOWrapper, config: LineConfig) -> (list[str], list[str]):
-    header_lines = []
-    lines: list[str] = []
+    :param list[str] header_lines: The `! //` header lines, description comments and blank lines before the first entry
+    :param list[str] lines: The entries (and inline comments) under the header
+    :param list[str] domains: The domains from the section's `! domains=[...]` comments, which every entry is repeated under.
+        Kept apart from `lines` and only expanded by `iter_expanded_lines`
+    """
+    header_lines: list[str]
+    lines: list[str]
+    domains: list[str] = field(default_factory=list)
+
+
+def get_input_files(path: str) -> list[str]:
+    """
+    :return: Every file under the folder `path`, sorted case-insensitively, or just `path` if it is a file. Empty if it is neither
+    """
+    if isdir(path):
+        return sorted(
+            (join(dirpath, f) for dirpath, dirnames, filenames in walk(path) for f in filenames),
+            key=str.lower
+        )
+
+    if isfile(path):
+        return [path]
+
+    warnings.warn(f"Path {path} is not a valid file or folder, skipping")
+    return []
+
+def iter_buffer_lines(buffer: bytes | mmap.mmap) -> Iterator[str]:
+    """
+    Yield the decoded lines of a utf-8 buffer (such as a memory-mapped file), keeping their line endings.
+    `\\r\\n` endings are normalised to `\\n`, to match reading the file in text mode
+    """
+    start = 0
+    end = len(buffer)
+
+    while start < end:
+        newline = buffer.find(b"\n", start)
+        if newline == -1:
+            newline = end - 1
+
+        line = buffer[start:newline + 1].decode("utf-8")
+        if line.endswith("\r\n"):
+            line = line[:-2] + "\n"
+
+        yield line
+        start = newline + 1
+
+def iter_file_lines(path: str) -> Iterator[str]:
+    """
+    Yield the lines of the file at `path` from a read-only memory map, without going through a text-mode reader
+    """
+    with open(path, "rb") as f:
+        if fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield from iter_buffer_lines(buffer)
+
+def iter_read_lines(path: str, buffer_size: int = 1 << 20) -> Iterator[str]:
+    """
+    Yield the lines of the file at `path` like `iter_file_lines`, reading it in `buffer_size` blocks instead of mapping it,
+    so only the current block is resident however large the file is
+    """
+    with open(path, "rb", buffering=buffer_size) as f:
+        for line in f:
+            line = line.decode("utf-8")
+            if line.endswith("\r\n"):
+                line = line[:-2] + "\n"
+
+            yield line
+
+def format_entry(line: str, config: LineConfig) -> str:
+    """
+    Apply the url prefix and suffix from `config` to an entry line, and normalise its line ending
+    """
+    if config.apply_url_prefix:
+        if not line.startswith(config.url_prefix):
+            line = config.url_prefix + line
+
+    if config.apply_url_suffix:
+        line = line.rstrip()
+        if not line.endswith(config.url_suffix):
+            line = line + config.url_suffix
+
+    # Most lines are already in this form, so they aren't copied
+    if line.endswith("\n") and not line[-2:-1].isspace():
+        return line
+
+    # Bandaid fix for a line that ends the file and is to be sorted
+    return line.rstrip() + "\n"
+
+def parse_domains(line: str) -> list[str] | None:
+    """
+    :return: The domains listed in a `! domains=[...]` comment, `None` if `line` isn't one
+    """
+    temp_line = line.strip(' !')
+    if not temp_line.startswith('domains='):
+        return None
+
+    return json.loads(temp_line.removeprefix('domains='))
+
+def iter_expanded_lines(lines: Iterable[str], domains: list[str], config: LineConfig) -> Iterator[str]:
+    """
+    Yield `lines` with every entry repeated once per domain, prefixed with it, the way `iter_entries` expands them.
+    Comments and blank lines are yielded once
+    """
+    comment_prefixes = (config.header_prefix, config.comment_prefix)
+
+    for line in lines:
+        if line.startswith(comment_prefixes) or line == "\n":
+            yield line
+            continue
 
+        for d in domains:
+            yield d + line
+
+def iter_entries(lines: Iterable[str], config: LineConfig) -> Iterator[tuple[int, list[str]]]:
+    """
+    Yield `(line_number, entries)` for every entry line, with line numbers starting at 1.
+    Lines are classified and prefixed/suffixed the same way as in `iter_section_chunks`
+
+    :return: `entries` holds the line once per domain of its section's `! domains=[...]` comment when `config.expand_domains` is set, otherwise just the line
+    """
+    has_entries = False
     domains = []
 
-    while True:
-        position = file.tell()
-        line = file.readline()
+    for line_number, line in enumerate(lines, 1):
+        if line.startswith(config.header_prefix):
+            if has_entries:
+                has_entries = False
+                domains = []
+            continue
+
+        if line.startswith(config.comment_prefix):
+            if not has_entries and config.expand_domains:
+                domains.extend(parse_domains(line) or [])
+            continue
+
+        if line == "\n":
+            continue
+
+        has_entries = True
+
+        line = format_entry(line, config)
 
-        # We hit a header
+        if config.expand_domains and len(domains) > 0:
+            yield (line_number, [d + line for d in domains])
+        else:
+            yield (line_number, [line])
+
+def iter_section_chunks(lines: Iterable[str], config: LineConfig, max_lines: int | None = None) -> Iterator[tuple[Section, bool]]:
+    """
+    Split a stream of lines into sections, without seeking
+
+    A section ends when a `config.header_prefix` line is met after at least one entry.
+    Comments and blank lines before the first entry are kept as header lines, blank lines after it are dropped.
+    With `config.expand_domains`, the `! domains=[...]` of each section are kept in `Section.domains` instead of repeating the entries
+
+    :param Iterable[str] lines: Any iterable of lines with their line endings, such as an open file or `iter_file_lines`
+    :param int max_lines: Yield sections with more lines than this in parts, so a huge section is never held in memory at once.
+    Parts after the first have no header lines
+    :return: Each section or part of a section, and whether it is the last part of its section
+    """
+    header_lines: list[str] = []
+    section_lines: list[str] = []
+    domains: list[str] = []
+    has_entries = False
+
+    for line in lines:
         if line.startswith(config.header_prefix):
-            if len(lines) == 0: # keep appending header lines
-                header_lines.append(line)
-                continue
-            file.seek(position) # reset to before the next header
-            break
+            if has_entries:
+                yield Section(header_lines, section_lines, domains), True
+                header_lines = []
+                section_lines = []
+                domains = []
+                has_entries = False
+
+            header_lines.append(line)
+            continue
 
-        # A non-header comment
         if line.startswith(config.comment_prefix):
-            if len(lines) == 0:
+            if not has_entries:
                 if config.expand_domains:
-                    temp_line = line.strip(' !')
-                    if temp_line.startswith('domains='):
-                        domains.extend(json.loads(temp_line.removeprefix('domains=')))
+                    domains.extend(parse_domains(line) or [])
 
-                header_lines.append(line) # Assume that the comment is extra description
+                header_lines.append(line)
             else:
-                # Add the comment into the normal lines
-                # Will get sorted without the comment prefix in the sort function
-                lines.append(line)
+                section_lines.append(line)
             continue
 
         if line == "\n":
-            if len(lines) == 0:
+            if not has_entries:
                 header_lines.append(line)
-            # empty newlines aren't kept in the sorted lines under the header
             continue
 
-        # We hit the end of the file
-        if line == "":
-            break
+        has_entries = True
+        section_lines.append(format_entry(line, config))
 
-        if config.apply_url_prefix:
-            if not line.startswith(config.url_prefix):
-                line = config.url_prefix + line
+        if max_lines is not None and len(section_lines) >= max_lines:
+            yield Section(header_lines, section_lines, domains), False
+            header_lines = []
+            section_lines = []
 
-        if config.apply_url_suffix:
-            line = line.rstrip()
-            if not line.endswith(config.url_suffix):
-                line = line + config.url_suffix
-            line = line + "\n"
+    if has_entries or len(header_lines) > 0:
+        yield Section(header_lines, section_lines, domains), True
 
-        # Bandaid fix for a line that ends the file and is to be sorted
-        line = line.rstrip() + "\n"
+def get_sections(lines: Iterable[str], config: LineConfig) -> list[Section]:
+    """
+    Split a whole file (or any iterable of lines) into its sections.
+    With `config.expand_domains`, the `! domains=[...]` of each section are kept in `Section.domains` instead of repeating the entries
 
-        # Expand the domains list for each real line
-        # Don't use this when sorting, as that will put each domain after the entirety of that domain
-        if config.expand_domains and len(domains) > 0:
-            for d in domains:
-                lines.append(d + line)
-
-            continue
+    :return: Every section in the file, in file order
+    """
+    return [section for section, _ in iter_section_chunks(lines, config)]
 
-        lines.append(line)
+def parse_file(path: str, config: LineConfig) -> list[Section]:
+    return get_sections(iter_file_lines(path), config)
 
-    return (header_lines, lines)
+def get_sort_key(line: str, config: LineConfig) -> str:
+    return line.removeprefix(config.comment_prefix).strip(" ./").lower()
 
 @overload
-def get_sorted_line_list(line_list: (list[str], list[str]), config: LineConfig) -> list[str]: ...
+def get_sorted_line_list(line_list: tuple[list[str], list[str]], config: LineConfig) -> list[str]: ...
 @overload
-def get_sorted_line_list(file: TextIOWrapper, config: LineConfig) -> list[str]: ...
+def get_sorted_line_list(section: Section, config: LineConfig) -> list[str]: ...
 
-def get_sorted_line_list(file_input, config: LineConfig) -> list[str]:
+def get_sorted_line_list(section_input, config: LineConfig) -> list[str]:
     header_lines = []
     lines = []
 
-    if isinstance(file_input, tuple):
-        header_lines = file_input[0]
-        lines = file_input[1]
+    if isinstance(section_input, tuple):
+        header_lines = section_input[0]
+        lines = section_input[1]
 
-    elif isinstance(file_input, TextIOWrapper):
-        header_lines, lines = get_line_list(file=file_input, config=config)
+    elif isinstance(section_input, Section):
+        header_lines = section_input.header_lines
+        lines = section_input.lines
 
     decorated = [
-        (line.removeprefix(config.comment_prefix).strip(" ./").lower(), i, line)
+        (get_sort_key(line, config), i, line)
         for i, line in enumerate(lines)
     ]
     decorated.sort()
@@ -107,3 +271,149 @@ def get_sorted_line_list(file_input, config: LineConfig) -> list[str]:
 
     return header_lines + sorted_lines
 
+class ExternalSorter:
+    """
+    Sorts lines by `get_sort_key` within a memory budget.
+    Once the buffered lines pass `memory_budget` bytes they are sorted and spilled to a temporary file as a run,
+    and the runs are k-way merged when the sorted lines are read. Lines with equal keys keep their original order
+
+    Every line is given a trailing `\\n` so it can be read back from a run
+    """
+
+    def __init__(self, config: LineConfig, memory_budget: int, temp_folder: str | None = None):
+        self.config = config
+        self.memory_budget = memory_budget
+        self.temp_folder = temp_folder
+
+        self.lines: list[str] = []
+        self.buffered_bytes = 0
+        self.run_paths: list[str] = []
+
+    def add(self, line: str):
+        if not line.endswith("\n"):
+            line = line + "\n"
+
+        self.lines.append(line)
+        # the line, its key and the decorated tuple used while sorting
+        self.buffered_bytes += 2 * sys.getsizeof(line) + 64
+
+        if self.buffered_bytes >= self.memory_budget:
+            self._spill()
+
+    def _sort_buffer(self) -> list[str]:
+        config = self.config
+        decorated = [(get_sort_key(line, config), i, line) for i, line in enumerate(self.lines)]
+        self.lines = []
+        self.buffered_bytes = 0
+
+        decorated.sort()
+        return [line for key, i, line in decorated]
+
+    def _spill(self):
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.temp_folder, prefix="sort_run_", suffix=".txt", delete=False) as run:
+            self.run_paths.append(run.name)
+            run.writelines(self._sort_buffer())
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Yield every added line in sorted order, then reset the sorter
+        """
+        if len(self.run_paths) == 0:
+            yield from self._sort_buffer()
+            return
+
+        if len(self.lines) > 0:
+            self._spill()
+
+        run_files = [open(path, "r", encoding="utf-8") for path in self.run_paths]
+        try:
+            # merge takes from the earlier run on equal keys, and runs are in input order, so the sort stays stable
+            yield from heapq.merge(*run_files, key=lambda line: get_sort_key(line, self.config))
+        finally:
+            self.close(run_files)
+
+    def close(self, run_files: list = []):
+        for run_file in run_files:
+            run_file.close()
+
+        for path in self.run_paths:
+            remove(path)
+
+        self.run_paths = []
+        self.lines = []
+        self.buffered_bytes = 0
+
+def iter_sorted_sections(lines: Iterable[str], config: LineConfig, memory_budget: int, temp_folder: str | None = None) -> Iterator[str]:
+    """
+    Stream `lines` back with the entries under each header sorted, like `get_sorted_line_list` on every section in turn,
+    without holding a whole section in memory. Each section is followed by a blank line
+
+    :param int memory_budget: Roughly how many bytes of entries to buffer before spilling a sorted run to disk
+    """
+    sorter = ExternalSorter(config, memory_budget, temp_folder)
+    has_entries = False
+
+    try:
+        for line in lines:
+            if line.startswith(config.header_prefix):
+                if has_entries: # the previous section is complete
+                    yield from sorter
+                    yield "\n"
+                    has_entries = False
+
+                yield line
+                continue
+
+            if line.startswith(config.comment_prefix):
+                if has_entries:
+                    sorter.add(line) # sorted without the comment prefix
+                else:
+                    yield line
+                continue
+
+            if line == "\n":
+                if not has_entries:
+                    yield line
+                continue
+
+            sorter.add(format_entry(line, config))
+            has_entries = True
+
+        if has_entries:
+            yield from sorter
+        yield "\n"
+    finally:
+        sorter.close()
+
+def find_unsorted_line(lines: Iterable[str], config: LineConfig) -> tuple[int, str] | None:
+    """
+    Check that the entries under each header are already in `iter_sorted_sections` order, without sorting anything:
+    each entry (and each comment between entries) only has its sort key compared with the one before it
+
+    :return: The line number and contents of the first line that sorts before the line above it, `None` if every section is sorted
+    """
+    previous_key = None # None until the section has an entry
+
+    for line_number, line in enumerate(lines, 1):
+        if line.startswith(config.header_prefix):
+            previous_key = None
+            continue
+
+        if line.startswith(config.comment_prefix):
+            if previous_key is None: # part of the header
+                continue
+
+            key = get_sort_key(line if line.endswith("\n") else line + "\n", config)
+
+        elif line == "\n":
+            continue
+
+        else:
+            key = get_sort_key(format_entry(line, config), config)
+
+        if previous_key is not None and key < previous_key:
+            return line_number, line
+
+        previous_key = key
+
+    return None
@@ -1,41 +1,37 @@
 import optparse as opt
+import os
+import re
+import sys
+import time
 import warnings
-from dataclasses import dataclass
-from io import TextIOWrapper
-from os import walk, makedirs, remove
-from os.path import isfile, isdir, join, exists
-from typing import overload
+from functools import cached_property, lru_cache
+from dataclasses import dataclass, asdict, field, replace
+from os import makedirs
+from os.path import abspath, dirname, isfile, isdir, join, exists, splitext
+from typing import BinaryIO, overload
 import get_line_list
+import build_cache as build_cache_module
+import build_stats
+import source_watcher
+import output_writer
+import release_artifacts
+import export_formats
+import validate_entries
+from export_formats import ExportTarget, FormatOptions
 
 opts = None
 args = None
+build_cache: build_cache_module.BuildCache | None = None
+write_results: list[output_writer.WriteResult] = []
+stats = build_stats.BuildStats()
+format_targets: list[ExportTarget] = []
 
-@dataclass
-class FormatOptions:
-    """
-    :param str line_format: The format to place the line contents into. `"{url}"` in this string gets replaced with the line contents
-    :param str engine: The engine that this line is being created for. Replaces `"{engine}"` in a string beginning with `header_prefix` or `comment_prefix`
-    :param str header_prefix: The prefix expected for a commented header line
-    :param str comment_prefix: The prefix expected for a commented line
-    :param str comment_replacement: The string to replace the comment prefix with. Use when the engine doesn't use the default comment character (`!`)
-    
-    :param bool apply_prefix: Whether to check for and apply `line_prefix_to_apply`
-    :param bool apply_suffix: Whether to check for and apply `line_suffix_to_apply`
-
-    :param bool hosts_mode: Removes leading whitespace and periods, comments out lines that contain `/`
-    """
-    line_format: str
-    engine: str
-    header_prefix: str = "! //"
-    comment_prefix: str = "!"
-    comment_replacement: str = "!"
-    apply_prefix: bool = False
-    line_prefix_to_apply: str = ""
-    apply_suffix: bool = False
-    line_suffix_to_apply: str = ""
-
-    # extra handling for the hosts.txt format
-    hosts_mode: bool = False
+# the stages reported by --stats, in the order they run. "expand" runs as part of "format"
+STAGES = ["get_files", "parse", "expand", "format", "write", "compile", "patch", "compress"]
+
+# entries rendered at a time when streaming, so a huge section is never held in memory at once
+STREAM_CHUNK_LINES = 1 << 16
+STREAM_BUFFER_SIZE = 1 << 20
 
 def get_opts() -> opt.Values:
     parser = opt.OptionParser(
@@ -43,57 +39,78 @@ def get_opts() -> opt.Values:
         )
 
     ## Formats
-    formats = opt.OptionGroup(parser, "Formats")
+    formats = opt.OptionGroup(parser, "Formats", "The exports are defined in the --format-config file. These options turn its targets on and off by name")
+    formats.add_option(
+        "--format-config",
+        dest='format_config', default=join(dirname(abspath(__file__)), "formats.toml"),
+        help='The TOML (or .json) file listing the export targets and their formats \nDefault = "formats.toml" next to this script')
+    formats.add_option(
+        "--target",
+        action='append', dest='targets', metavar="NAME",
+        help='Export a target, including ones with "enabled = false" such as adguard, dnsmasq, unbound and pihole. Can be given more than once')
+    formats.add_option(
+        "--skip-target",
+        action='append', dest='skip_targets', metavar="NAME",
+        help="Don't export a target. Can be given more than once")
 
     # Hosts
     formats.add_option(
         "--hosts",
-        action='store_true', dest='create_hosts', default=True,
+        action='append_const', dest='targets', const="hosts",
         help='Enable hosts.txt file creation (default)')
     formats.add_option(
         "--no-hosts",
-        action='store_false', dest='create_hosts',
+        action='append_const', dest='skip_targets', const="hosts",
         help='Disable all hosts file creation. Includes --no-compile-hosts')
     formats.add_option(
         "--compile-hosts",
-        action='store_true', dest='compile_hosts', default=True,
+        action='append_const', dest='compile_targets', const="hosts",
         help='Compile all hosts formats (default)')
     formats.add_option(
         "--no-compile-hosts",
-        action='store_false', dest='compile_hosts',
+        action='append_const', dest='skip_compile_targets', const="hosts",
         help="Don't compile the hosts.txt formats together")
 
 
     # uBlacklist
     formats.add_option(
         "--ublacklist",
-        action='store_true', dest='create_ublacklist', default=True,
+        action='append_const', dest='targets', const="ublacklist",
         help='Create uBlacklist file format (default)')
     formats.add_option(
         "--no-ublacklist", 
-        action='store_false', dest='create_ublacklist',
+        action='append_const', dest='skip_targets', const="ublacklist",
         help="Don't create uBlacklist file format")
 
 
     # uBlockOrigin
     formats.add_option(
         "--ublockorigin", "--ubo", "--ublock",
-        action='store_true', dest='create_ublockorigin', default=True,
+        action='append_const', dest='targets', const="ublockorigin",
         help='Create uBlockOrigin file (default)')
     formats.add_option(
         "--no-ublockorigin", "--no-ubo", "--no-ublock",
-        action='store_false', dest='create_ublockorigin',
+        action='append_const', dest='skip_targets', const="ublockorigin",
         help='Disable all uBlockOrigin file creation. Includes --no-compile-ublockorigin')
     formats.add_option(
         "--compile-ublockorigin", "--compile-ubo", "--compile-ublock",
-        action='store_true', dest='compile_ublockorigin', default=True,
+        action='append_const', dest='compile_targets', const="ublockorigin",
         help='Compile all uBlockOrigin formats (default)')
     formats.add_option(
         "--no-compile-ublockorigin", "--no-compile-ubo", "--no-compile-ublock",
-        action='store_false', dest='compile_ublockorigin',
+        action='append_const', dest='skip_compile_targets', const="ublockorigin",
         help="Don't compile the uBlockOrigin formats together")
+    formats.add_option(
+        "--compact-ublockorigin", "--compact-ubo", "--compact-ublock",
+        action='store_true', dest='compact_ublockorigin', default=False,
+        help='Group entries into fewer uBlockOrigin rules with :is(), and share rules between engines in the compiled list where the selectors match. Applies to the targets with "compact = true"')
+    formats.add_option(
+        "--compact-rule-size",
+        type='int', dest='compact_rule_size', default=50,
+        help='The most entries grouped into one rule by --compact-ublockorigin \nDefault = 50')
 
     parser.add_option_group(formats)
+    parser.set_defaults(targets=[], skip_targets=[], compile_targets=[], skip_compile_targets=[])
 
 
     ## Folders
@@ -139,6 +156,99 @@ def get_opts() -> opt.Values:
         action='store_false', dest='overwrite',
         help="Don't allow ovewriting existing files in the export directory")
 
+    # Validation
+    parser.add_option(
+        "--validate",
+        action='store_true', dest='validate', default=False,
+        help='Check the source entries as they are parsed, and warn about invalid hostnames, characters that break the exported rules, '
+             'stray whitespace, uppercase hostnames and duplicates within a section, with their file and line. '
+             'The exports are then rendered from the normalised entries: trimmed, with lowercase hostnames and without the duplicates. Not used by --stream')
+
+    # Release artifacts
+    parser.add_option(
+        "--compress",
+        action='store_true', dest='compress', default=False,
+        help='Also write each export compressed, as .gz, and as .zst and .br when the zstandard and brotli modules are installed')
+    parser.add_option(
+        "--patches",
+        action='store_true', dest='patches', default=False,
+        help='Start each export with a "Version:" checksum line, and write a line diff from the previous build to "patches/NAME.VERSION.patch" next to it whenever it changes')
+    parser.add_option(
+        "--patch-history",
+        type='int', dest='patch_history', default=30,
+        help='Number of patches to keep for each export, older ones are removed \nDefault = 30')
+
+    # Streaming
+    parser.add_option(
+        "--stream",
+        dest='stream_target',
+        help='Write a single export to stdout as it is rendered, instead of writing the export folder. '
+             'Takes the export\'s file name without ".txt", such as "hosts", "list_uBlacklist" or "Nuclear_google-list_uBlockOrigin". '
+             'Memory use stays flat however large the list is, and nothing is cached or written to disk')
+    parser.add_option(
+        "--stream-fd",
+        type='int', dest='stream_fd', default=1,
+        help='The file descriptor to stream to, such as one end of a pipe passed in by the calling process \nDefault = 1 (stdout)')
+
+    # Incremental builds
+    parser.add_option(
+        "--cache",
+        action='store_true', dest='use_cache', default=True,
+        help='Skip exported files whose inputs and format are unchanged since the last run, and reuse unchanged sections (default)')
+    parser.add_option(
+        "--no-cache",
+        action='store_false', dest='use_cache',
+        help='Rebuild every exported file from scratch')
+    parser.add_option(
+        "--cache-path",
+        dest='cache_path', default=".list_generator_cache.json",
+        help='The build manifest used for incremental builds \nDefault = ".list_generator_cache.json"')
+
+    # Watch mode
+    parser.add_option(
+        "-w", "--watch",
+        action='store_true', dest='watch', default=False,
+        help='Keep running and regenerate the exports whenever a file in the source folders changes')
+    parser.add_option(
+        "--watch-debounce",
+        type='float', dest='watch_debounce', default=0.1,
+        help='Seconds to wait for more changes after a save before regenerating \nDefault = 0.1')
+    parser.add_option(
+        "--watch-poll",
+        action='store_true', dest='watch_poll', default=False,
+        help='Poll the source folders for changes instead of using inotify')
+    parser.add_option(
+        "--watch-poll-interval",
+        type='float', dest='watch_poll_interval', default=0.5,
+        help='Seconds between scans of the source folders when polling \nDefault = 0.5')
+
+    # Parallelism
+    parser.add_option(
+        "-j", "--jobs",
+        type='int', dest='jobs', default=1,
+        help='Number of exported files to render at once \nDefault = 1')
+    parser.add_option(
+        "--pool",
+        type='choice', choices=['process', 'thread'], dest='pool', default="process",
+        help='Use a "process" or "thread" pool for --jobs above 1 \nDefault = "process"')
+
+    ## Diagnostics
+    diagnostics = opt.OptionGroup(parser, "Diagnostics")
+    diagnostics.add_option(
+        "--stats",
+        action='store_true', dest='stats', default=False,
+        help='Print the time, lines processed, bytes written and peak memory of each stage (get_files, parse, expand, format, write, compile). Expanding `! domains=[...]` sections is timed as part of format too')
+    diagnostics.add_option(
+        "--profile",
+        dest='profile_path',
+        help='Run under cProfile and save the profile to this path, for pstats or snakeviz')
+    diagnostics.add_option(
+        "--trace",
+        dest='trace_path',
+        help='Save a timeline of the stages to this path in the Chrome trace format, for chrome://tracing or ui.perfetto.dev')
+
+    parser.add_option_group(diagnostics)
+
     loaded_opts, loaded_args = parser.parse_args()
 
     return loaded_opts, loaded_args
@@ -179,25 +289,366 @@ def format_line(line: str, format_options: FormatOptions) -> str:
             line = line + format_options.line_suffix_to_apply
         line = line + "\n"
 
+    if format_options.escape_regex:
+        line = re.escape(line.rstrip())
+
     line_format = format_options.line_format.rstrip() + "\n" # Normalise the format line ending, add if not present
     return line_format.replace("{url}", line.rstrip())
 
-def get_files(folder: str) -> list[str]:
-    files = []
-    if isdir(folder):
-        files.extend([
-            join(dirpath, f)
-            for (dirpath, dirnames, filenames) in walk(folder)
-            for f in filenames
-        ])
-    else:
-        if isfile(folder):
-            warnings.warn(f"path '{folder}' is a file, proceeding with only {folder} in the file list")
-            files.append(folder)
+class LineRenderer:
+    """
+    A `FormatOptions` compiled into a line formatter.
+    Every option is resolved once here instead of on every line, and `line_format` is split into the text before and after `{url}`
+
+    Produces exactly the same lines as `format_line`
+    """
+
+    def __init__(self, format_options: FormatOptions):
+        self.format_options = format_options
+        self.comment_prefixes = (format_options.header_prefix, format_options.comment_prefix)
+        self.line_config = get_line_list.LineConfig(header_prefix=format_options.header_prefix, comment_prefix=format_options.comment_prefix)
+
+        # Normalise the format line ending, add if not present
+        self.template = format_options.line_format.rstrip() + "\n"
+        template_parts = self.template.split("{url}")
+        self.single_url = len(template_parts) == 2
+        self.url_prefix = template_parts[0]
+        self.url_suffix = template_parts[-1]
+
+        if format_options.escape_regex:
+            self.format_entry = self._format_entry
+        elif self.single_url and not (format_options.hosts_mode or format_options.apply_prefix or format_options.apply_suffix):
+            self.format_entry = self._format_plain_entry
+        elif self.single_url and format_options.hosts_mode and not (format_options.apply_prefix or format_options.apply_suffix):
+            self.format_entry = self._format_hosts_entry
         else:
-            warnings.warn(f"path '{folder}' is not a file or dir, proceeding with no files")
+            self.format_entry = self._format_entry
+
+        # For `format_section`: the text that ends up around every entry that the options leave untouched,
+        # and a pattern matching the line breaks next to lines that still need `format_line`.
+        # The pattern starts with the line break so the regex engine can skip ahead to each one
+        self.bulk_prefix = self.url_prefix
+        self.bulk_suffix = self.url_suffix
+        next_line_starts = ["\n", *[re.escape(prefix) for prefix in self.comment_prefixes]] # blank lines and comments
+        line_ends = ["[^\\S\n]"] # trailing whitespace, which `format_line` strips
+
+        if format_options.hosts_mode:
+            next_line_starts.append("[ .]") # lines with a `/` are found separately
+
+        if format_options.apply_prefix and format_options.line_prefix_to_apply != "":
+            self.bulk_prefix += format_options.line_prefix_to_apply
+            next_line_starts.append(re.escape(format_options.line_prefix_to_apply))
+
+        if format_options.apply_suffix and format_options.line_suffix_to_apply != "":
+            self.bulk_suffix = format_options.line_suffix_to_apply + self.bulk_suffix
+            line_ends.append(re.escape(format_options.line_suffix_to_apply))
+
+        self.scalar_line_breaks = None
+        # a suffix ending in whitespace would be stripped again by `format_line`, and escaped entries are never left untouched
+        if (self.single_url and not format_options.escape_regex and "\n" not in self.bulk_prefix + self.bulk_suffix[:-1]
+                and not (format_options.apply_suffix and format_options.line_suffix_to_apply != format_options.line_suffix_to_apply.rstrip())):
+            self.scalar_line_breaks = re.compile(
+                "\n(?:(?=" + "|".join(next_line_starts) + ")|" + "|".join("(?<=" + end + "\n)" for end in line_ends) + ")"
+            )
+
+    def format_comment(self, line: str) -> str:
+        line = line.replace("{engine}", self.format_options.engine)
+        # replace the comment character for other file types
+        return line.replace(self.format_options.comment_prefix, self.format_options.comment_replacement, 1)
+
+    def _format_plain_entry(self, line: str) -> str:
+        return self.url_prefix + line.rstrip() + self.url_suffix
+
+    def _format_hosts_entry(self, line: str) -> str:
+        line = line.strip(" .")
+        if "/" in line:
+            return "#       " + line
+
+        return self.url_prefix + line.rstrip() + self.url_suffix
+
+    def _format_entry(self, line: str) -> str:
+        format_options = self.format_options
+
+        if format_options.hosts_mode:
+            line = line.strip(" .")
+
+            if "/" in line:
+                return "#       " + line
+
+        if format_options.apply_prefix:
+            if not line.startswith(format_options.line_prefix_to_apply):
+                line = format_options.line_prefix_to_apply + line
+
+        if format_options.apply_suffix:
+            line = line.rstrip()
+            if not line.endswith(format_options.line_suffix_to_apply):
+                line = line + format_options.line_suffix_to_apply
+
+        if format_options.escape_regex:
+            line = re.escape(line.rstrip())
+
+        if self.single_url:
+            return self.url_prefix + line.rstrip() + self.url_suffix
 
-    return files
+        return self.template.replace("{url}", line.rstrip())
+
+    def format_line(self, line: str) -> str:
+        if line.startswith(self.comment_prefixes):
+            return self.format_comment(line)
+
+        if line == "" or line.isspace():
+            return line
+
+        return self.format_entry(line)
+
+    def format_lines(self, lines: list[str]) -> list[str]:
+        """
+        Format a whole section at once
+        """
+        comment_prefixes = self.comment_prefixes
+        format_comment = self.format_comment
+        format_entry = self.format_entry
+
+        if format_entry == self._format_plain_entry:
+            # Inlined to save a call per entry
+            url_prefix = self.url_prefix
+            url_suffix = self.url_suffix
+
+            return [
+                format_comment(line) if line.startswith(comment_prefixes)
+                else line if line == "" or line.isspace()
+                else url_prefix + line.rstrip() + url_suffix
+                for line in lines
+            ]
+
+        return [
+            format_comment(line) if line.startswith(comment_prefixes)
+            else line if line == "" or line.isspace()
+            else format_entry(line)
+            for line in lines
+        ]
+
+    @cached_property
+    def domain_rule_renderer(self) -> "CompactUBlockRenderer | None":
+        """
+        The rule templates of `line_format` split up by `CompactUBlockRenderer`, when every one of them can be grouped
+        so a `! domains=[...]` section needs just one rule per entry. Worked out on the first such section, `None` if they can't
+        """
+        format_options = self.format_options
+        if not self.single_url or format_options.hosts_mode or format_options.apply_prefix or format_options.apply_suffix or format_options.escape_regex:
+            return None
+
+        rule_renderer = CompactUBlockRenderer(format_options)
+        if len(rule_renderer.rule_groups) == 0 or len(rule_renderer.entry_templates) > 0:
+            return None
+
+        return rule_renderer
+
+    def format_domain_section(self, lines: list[str], domains: list[str]) -> str:
+        """
+        Format a section whose entries are repeated under each of `domains`, expanding them as they're formatted.
+        uBlockOrigin rules get a single rule per entry, matching it on every domain, when the rule template can be grouped
+        """
+        rule_renderer = self.domain_rule_renderer
+        if rule_renderer is not None and len(domains) > 1:
+            domain_format = replace(self.format_options, line_format=rule_renderer.get_domain_rule_format(domains))
+            return get_line_renderer(domain_format).format_section(lines)
+
+        # expanded a section at a time, so the repeated entries are only held while they're formatted
+        with stats.stage("expand"):
+            expanded_lines = list(get_line_list.iter_expanded_lines(lines, domains, self.line_config))
+        stats.count("expand", lines=len(expanded_lines))
+
+        return self.format_section(expanded_lines)
+
+    def format_section(self, lines: list[str], domains: list[str] = []) -> str:
+        """
+        Format a whole section into a single string, the same as joining `format_lines`.
+        Runs of plain entries are formatted in bulk by joining them and replacing every line break with the text between two entries,
+        only comments, blank lines and the entries the options change (such as hosts entries with a `/`) go through `format_line`
+
+        :param list[str] domains: The section's `Section.domains`, see `format_domain_section`
+        """
+        if len(domains) > 0:
+            return self.format_domain_section(lines, domains)
+
+        if self.scalar_line_breaks is None:
+            return "".join(self.format_lines(lines))
+
+        # the bulk path splits the section back into lines at each line break, so it needs every line to end with one,
+        # as they do when read from a file (only the last line of a file can be missing it)
+        text = "".join(lines)
+        if not text.endswith("\n") or text.count("\n") != len(lines):
+            return "".join(self.format_lines(lines))
+
+        # mostly subpages, which hosts files comment out line by line anyway
+        if self.format_options.hosts_mode and text.count("/") > len(lines) // 4:
+            return "".join(self.format_lines(lines))
+
+        # the start of every line to format on its own. Both lines around a matched line break are included,
+        # which formats a few plain entries through `format_line` too, but that gives the same result
+        scalar_lines = {0}
+        for match in self.scalar_line_breaks.finditer(text):
+            line_break = match.start()
+            scalar_lines.add(text.rfind("\n", 0, line_break) + 1)
+            scalar_lines.add(line_break + 1)
+
+        if self.format_options.hosts_mode:
+            slash = text.find("/")
+            while slash != -1:
+                scalar_lines.add(text.rfind("\n", 0, slash) + 1)
+                slash = text.find("/", text.find("\n", slash))
+
+        bulk_prefix = self.bulk_prefix
+        bulk_separator = self.bulk_suffix + bulk_prefix
+        bulk_suffix = self.bulk_suffix
+        format_line = self.format_line
+
+        parts = []
+        position = 0
+        for start in sorted(scalar_lines):
+            if start == len(text):
+                break
+
+            if start > position:
+                parts.append(bulk_prefix + text[position:start - 1].replace("\n", bulk_separator) + bulk_suffix)
+
+            position = text.index("\n", start) + 1
+            parts.append(format_line(text[start:position]))
+
+        if position < len(text):
+            parts.append(bulk_prefix + text[position:-1].replace("\n", bulk_separator) + bulk_suffix)
+
+        return "".join(parts)
+
+class CompactUBlockRenderer(LineRenderer):
+    """
+    A `LineRenderer` for uBlockOrigin cosmetic filters that puts up to `format_options.compact_rules` entries into each rule,
+    as `google.com##a:is([href*="one"],[href*="two"]):upward(2):remove()` instead of a rule per entry
+
+    Each line of `line_format` is a rule template. Templates whose selectors only differ by hostname share a single rule,
+    with the hostnames joined by `,`. Templates that can't be grouped are rendered once per entry
+    """
+
+    def __init__(self, format_options: FormatOptions):
+        super().__init__(format_options)
+        self.scalar_line_breaks = None
+
+        # (hostnames, text before the {url} attribute, attribute before {url}, attribute after {url}, text after the attribute)
+        self.rule_groups: list[list] = []
+        self.entry_templates: list[str] = []
+
+        for template in format_options.line_format.splitlines():
+            template = template.strip()
+            if template == "":
+                continue
+
+            hostnames, separator, selector = template.partition("##")
+            url_start = selector.find("{url}")
+            attribute_start = selector.rfind("[", 0, url_start)
+            attribute_end = selector.find("]", url_start)
+
+            if separator == "" or url_start == -1 or attribute_start == -1 or attribute_end == -1 or selector.count("{url}") > 1:
+                self.entry_templates.append(template + "\n")
+                continue
+
+            rule = [
+                selector[:attribute_start],
+                selector[attribute_start:url_start],
+                selector[url_start + len("{url}"):attribute_end + 1],
+                selector[attribute_end + 1:],
+            ]
+
+            for group in self.rule_groups:
+                if group[1:] == rule:
+                    group[0].append(hostnames)
+                    break
+            else:
+                self.rule_groups.append([[hostnames]] + rule)
+
+    def get_url(self, line: str) -> str:
+        format_options = self.format_options
+
+        if format_options.apply_prefix:
+            if not line.startswith(format_options.line_prefix_to_apply):
+                line = format_options.line_prefix_to_apply + line
+
+        if format_options.apply_suffix:
+            line = line.rstrip()
+            if not line.endswith(format_options.line_suffix_to_apply):
+                line = line + format_options.line_suffix_to_apply
+
+        return line.rstrip()
+
+    def format_domain_section(self, lines: list[str], domains: list[str]) -> str:
+        # the domains of an entry are consecutive, so they're grouped into rules like any other entries
+        return "".join(self.format_lines(get_line_list.iter_expanded_lines(lines, domains, self.line_config)))
+
+    def get_domain_rule_format(self, domains: list[str]) -> str:
+        """
+        :return: A `line_format` with a rule for each rule group, matching `{url}` under every one of `domains`
+        """
+        return "\n".join(
+            ",".join(hostnames) + "##" + before + ":is(" + ",".join(
+                attribute_prefix + d + "{url}" + attribute_suffix
+                for d in domains
+            ) + ")" + after
+            for hostnames, before, attribute_prefix, attribute_suffix, after in self.rule_groups
+        )
+
+    def format_rules(self, urls: list[str]) -> list[str]:
+        rules = []
+        chunk_size = max(1, self.format_options.compact_rules)
+
+        for hostnames, before, attribute_prefix, attribute_suffix, after in self.rule_groups:
+            rule_prefix = ",".join(hostnames) + "##" + before + ":is("
+            rule_suffix = ")" + after + "\n"
+
+            for start in range(0, len(urls), chunk_size):
+                rules.append(rule_prefix + ",".join([
+                    attribute_prefix + url + attribute_suffix
+                    for url in urls[start:start + chunk_size]
+                ]) + rule_suffix)
+
+        for template in self.entry_templates:
+            rules.extend(template.replace("{url}", url) for url in urls)
+
+        return rules
+
+    def format_line(self, line: str) -> str:
+        return "".join(self.format_lines([line]))
+
+    def format_lines(self, lines: list[str]) -> list[str]:
+        """
+        Format a whole section at once. Runs of entries between comments and blank lines are grouped into rules
+        """
+        formatted_lines = []
+        urls = []
+
+        for line in lines:
+            if line.startswith(self.comment_prefixes) or line == "" or line.isspace():
+                # keep comments in place, between the rules of the entries around them
+                if len(urls) > 0:
+                    formatted_lines.extend(self.format_rules(urls))
+                    urls = []
+
+                formatted_lines.append(line if line == "" or line.isspace() else self.format_comment(line))
+                continue
+
+            urls.append(self.get_url(line))
+
+        if len(urls) > 0:
+            formatted_lines.extend(self.format_rules(urls))
+
+        return formatted_lines
+
+# compiled once for each format, then reused for every file and section rendered with it (and by each regeneration in --watch)
+@lru_cache(maxsize=256)
+def get_line_renderer(format_options: FormatOptions) -> LineRenderer:
+    if format_options.compact_rules > 0 and not format_options.hosts_mode:
+        return CompactUBlockRenderer(format_options)
+
+    return LineRenderer(format_options)
 
 @overload
 def get_files_sorted(folder: str) -> list[str]: ...
@@ -206,205 +657,625 @@ def get_files_sorted(files: list[str]) -> list[str]: ...
 
 def get_files_sorted(file_input) -> list[str]:
     if isinstance(file_input, str):
-        files = get_files(file_input)
-        return sorted(files, key=str.lower)
+        if isfile(file_input):
+            warnings.warn(f"path '{file_input}' is a file, proceeding with only {file_input} in the file list")
+        return get_line_list.get_input_files(file_input)
 
     if isinstance(file_input, list[str]):
         return sorted(file_input, key=str.lower)
 
-def write_formatted_lines_to_file(input_file_paths: list[str], output_file: TextIOWrapper, format_options: FormatOptions):
+def parse_files(input_file_paths: list[str], validate: bool = False) -> dict[str, list[get_line_list.Section]]:
+    """
+    Parse every source file once, so each output format can be rendered from the same sections.
+    Unchanged files are loaded from the build cache when it is enabled
 
+    :param bool validate: Check and normalise the entries as they're parsed (--validate), and warn about the problems found
+    :return: The sections of each path that is a file, keyed by path
+    """
     line_config = get_line_list.LineConfig(expand_domains=True)
+    validator = validate_entries.EntryValidator() if validate else None
 
-    # write all the formatted lines from the appropriate files
+    if build_cache is not None:
+        parse_file = lambda path, config: build_cache.parse_file(path, config, validator)
+    elif validator is not None:
+        parse_file = validator.parse_file
+    else:
+        parse_file = get_line_list.parse_file
+
+    with stats.stage("parse"):
+        parsed_files = {
+            input_file: parse_file(input_file, line_config)
+            for input_file in input_file_paths
+            if isfile(input_file)
+        }
+
+    # printed rather than warned, so --watch shows them again on every rebuild
+    if validator is not None and len(validator.problems) > 0:
+        print(f"{len(validator.problems)} problems in the source entries:\n" + "\n".join(str(problem) for problem in validator.problems), file=sys.stderr)
+
+    stats.count("parse", lines=sum(
+        len(section.header_lines) + len(section.lines)
+        for sections in parsed_files.values()
+        for section in sections
+    ))
+
+    return parsed_files
+
+def get_parsed_sources(input_file_paths: list[str], parsed_files: dict[str, list[get_line_list.Section]]) -> dict[str, list[get_line_list.Section]]:
+    return {path: parsed_files[path] for path in input_file_paths if path in parsed_files}
+
+def read_element_lines(input_file_paths: list[str]) -> list[str]:
+    lines = []
     for input_file in input_file_paths:
-        if isfile(input_file):
-            with open(input_file, "r", encoding="utf-8") as f:
-                while True:
-                    header_lines, lines = get_line_list.get_line_list(f, line_config)
-                    if (len(header_lines) == 0 and len(lines) == 0):
-                        output_file.write('\n')
-                        break
+        lines.extend(get_line_list.iter_file_lines(input_file))
+
+    return lines
+
+def render_formatted_lines(
+        sources: dict[str, list[get_line_list.Section]],
+        format_options: FormatOptions,
+        extra_lines: list[str] = [],
+        reusable_chunks: dict[str, str] = {},
+        with_digests: bool = False,
+        header_lines: list[str] = []
+    ) -> tuple[list[str], list[list]]:
+    """
+    Render every section of `sources`, followed by `extra_lines` (already formatted)
 
-                    output_file.writelines([
-                        format_line(line, format_options)
-                        for line in header_lines + lines
-                    ])
+    :param list[str] header_lines: Lines put before the sections as they are, such as the header of a compiled file
+    :param dict reusable_chunks: Previously rendered sections keyed by digest, used as-is instead of formatting the section again
+    :param bool with_digests: Whether to compute section digests for the build cache
+    :return: The rendered chunks, and the `[digest, length]` of each one. The digest is `None` for chunks that aren't sections
+    """
+    renderer = get_line_renderer(format_options)
+    parts = []
+    chunks = []
+    formatted_lines = 0
+
+    if len(header_lines) > 0:
+        parts.append("".join(header_lines))
+        chunks.append([None, len(parts[0])])
+
+    with stats.stage("format", engine=format_options.engine):
+        for sections in sources.values():
+            for section in sections:
+                digest = None
+                if with_digests:
+                    digest = build_cache_module.get_section_digest(section)
+
+                if digest in reusable_chunks:
+                    text = reusable_chunks[digest]
+                else:
+                    text = renderer.format_section(section.header_lines + section.lines, section.domains) + "\n"
+                    formatted_lines += len(section.header_lines) + len(section.lines)
+
+                parts.append(text)
+                chunks.append([digest, len(text)])
+
+            parts.append('\n')
+            chunks.append([None, 1])
+
+        parts.extend(extra_lines)
 
-                    output_file.write("\n")
+    stats.count("format", lines=formatted_lines)
 
-def try_write_to_path(path: str, input_file_paths: list[str], format_options: FormatOptions) -> bool:
+    return parts, chunks
+
+@dataclass
+class PendingOutput:
+    """
+    An export that passed the overwrite and build cache checks in `check_output_path`, and still needs rendering
+    """
+    path: str
+    sources: dict[str, list[get_line_list.Section]]
+    format_options: FormatOptions
+    extra_lines: list[str]
+    cache_key: dict | None = None
+    reusable_chunks: dict[str, str] = field(default_factory=dict)
+    header_lines: list[str] = field(default_factory=list)
+
+def check_output_path(path: str, sources: dict[str, list[get_line_list.Section]], format_options: FormatOptions, extra_lines: list[str] = [], header_lines: list[str] = []) -> PendingOutput | bool:
+    """
+    :return: A `PendingOutput` if `path` needs to be rendered. Otherwise whether `path` can be used as a finished export (`True` if it is up to date, `False` if it was skipped)
+    """
+    key = None
+    reusable_chunks = {}
+    if build_cache is not None:
+        key = build_cache.get_output_key(list(sources), asdict(format_options) | {"versioned": opts.patches, "validated": opts.validate, "header": header_lines}, extra_lines)
+        if build_cache.is_up_to_date(path, key):
+            print(f"{path} is up to date, skipping")
+            return True
 
     if exists(path) and isfile(path):
-        if opts.overwrite:
-            remove(path)
-        else:
+        if not opts.overwrite:
             warnings.warn(f"Target file {path} exists and overwriting is disabled, skipping")
             return False
 
+        if build_cache is not None:
+            reusable_chunks = build_cache.get_reusable_chunks(path, key["format"])
+
     elif isdir(path):
         warnings.warn(f"Target file {path} is a directory, skipping")
         return False
 
-    with open(path, "x", encoding="utf-8") as f:
-        write_formatted_lines_to_file(input_file_paths, f, format_options)
-        print(f"Successfully wrote {path}")
-        return True
+    return PendingOutput(path, sources, format_options, extra_lines, key, reusable_chunks, header_lines)
+
+def report_write(result: output_writer.WriteResult, verb: str = "wrote"):
+    write_results.append(result)
+
+    if result.written:
+        print(f"Successfully {verb} {result.path} ({output_writer.format_size(result.size)})")
+    else:
+        print(f"{result.path} is unchanged, skipped writing {output_writer.format_size(result.size)}")
+
+def write_parts(path: str, parts: list[str], stage: str) -> output_writer.WriteResult:
+    # the build being replaced, for the patch to this one
+    previous_text = None
+    if opts.patches and isfile(path):
+        with open(path, "rt", encoding="utf-8") as f:
+            previous_text = f.read()
+
+    with stats.stage(stage, path=path):
+        result = output_writer.write_if_changed(path, parts)
+
+    stats.count(stage, bytes=result.size if result.written else 0)
+
+    if previous_text is not None and result.written:
+        write_patch(path, previous_text, "".join(parts))
+
+    return result
+
+def write_patch(path: str, previous_text: str, text: str):
+    with stats.stage("patch", path=path):
+        patch = release_artifacts.make_patch(os.path.basename(path), previous_text, text)
+        if patch is None: # the previous build wasn't versioned
+            return
+
+        previous_version, patch_text = patch
+        patch_folder = join(dirname(path), "patches")
+        makedirs(patch_folder, exist_ok=True)
+
+        result = output_writer.write_if_changed(release_artifacts.get_patch_path(patch_folder, path, previous_version), [patch_text])
+        release_artifacts.prune_patches(patch_folder, path, opts.patch_history)
+
+    stats.count("patch", bytes=result.size)
+    report_write(result, "wrote patch")
+
+def write_compressed(paths: list[str]):
+    for path in paths:
+        if not isfile(path):
+            continue
+
+        for compressor in release_artifacts.get_compressors():
+            with stats.stage("compress", path=path, format=compressor.name):
+                result = release_artifacts.write_compressed(path, compressor)
+
+            if result is not None:
+                stats.count("compress", bytes=result.size)
+                report_write(result, "compressed")
+
+def finish_output(output: PendingOutput, parts: list[str], chunks: list[list], rendered_outputs: dict[str, list[str]] | None = None) -> bool:
+    rendered_parts = parts
+    if opts.patches:
+        parts = release_artifacts.add_version_line(parts)
+        chunks = [[None, len(parts[0])]] + chunks
+
+    report_write(write_parts(output.path, parts, "write"))
+
+    if build_cache is not None:
+        build_cache.record_output(output.path, output.cache_key, chunks)
+
+    # Kept so the compiled files can be built without reading the export back
+    if rendered_outputs is not None:
+        rendered_outputs[output.path] = rendered_parts
+
+    return True
+
+def try_write_to_path(
+        path: str,
+        sources: dict[str, list[get_line_list.Section]],
+        format_options: FormatOptions,
+        extra_lines: list[str] = [],
+        header_lines: list[str] = [],
+        rendered_outputs: dict[str, list[str]] | None = None
+    ) -> bool:
+
+    output = check_output_path(path, sources, format_options, extra_lines, header_lines)
+    if not isinstance(output, PendingOutput):
+        return output
+
+    parts, chunks = render_formatted_lines(sources, format_options, extra_lines, output.reusable_chunks, build_cache is not None, header_lines)
+    return finish_output(output, parts, chunks, rendered_outputs)
+
+def stream_formatted_lines(input_file_paths: list[str], format_options: FormatOptions, output_file: BinaryIO, extra_lines: list[str] = [], header_lines: list[str] = []) -> int:
+    """
+    Render like `render_formatted_lines`, but straight from the source files into `output_file`, `STREAM_CHUNK_LINES` entries at a time.
+    Nothing is kept once it is written, so memory use doesn't grow with the size of the list.
+    Compact uBlockOrigin rules start a new group at each chunk, which doesn't change what they match
+
+    :return: The number of bytes written
+    """
+    renderer = get_line_renderer(format_options)
+    line_config = get_line_list.LineConfig(expand_domains=True)
+    written = output_file.write(output_writer.encode_parts(header_lines))
+
+    for path in input_file_paths:
+        if not isfile(path):
+            continue
+
+        formatted_lines = 0
+        with stats.stage("stream", path=path):
+            for section, ends_section in get_line_list.iter_section_chunks(get_line_list.iter_read_lines(path, STREAM_BUFFER_SIZE), line_config, STREAM_CHUNK_LINES):
+                text = renderer.format_section(section.header_lines + section.lines, section.domains)
+                if ends_section:
+                    text += "\n"
+
+                written += output_file.write(output_writer.encode_parts([text]))
+                formatted_lines += len(section.header_lines) + len(section.lines)
+
+            written += output_file.write(output_writer.encode_parts(["\n"]))
+
+        stats.count("stream", lines=formatted_lines)
+
+    written += output_file.write(output_writer.encode_parts(extra_lines))
+    stats.count("stream", bytes=written)
+
+    return written
+
+def is_target_enabled(target: ExportTarget) -> bool:
+    return target.name in opts.targets or (target.enabled and target.name not in opts.skip_targets)
+
+def is_target_compiled(target: ExportTarget) -> bool:
+    if target.compiled_file_name is None:
+        return False
+
+    return target.name in opts.compile_targets or target.name not in opts.skip_compile_targets
+
+def get_target_exports(target: ExportTarget, common_files: list[str], list_files: list[str], nuclear_files: list[str], element_lines: list[str]) -> list[tuple[str, list[str], FormatOptions, list[str], list[str], bool]]:
+    """
+    :return: The file name, source files, format, extra lines and header lines of each export of `target`, and whether it is made from `Nuclear/`.
+    With --compact-ublockorigin, the compiled files are rendered in one pass and are included too, under the compiled header
+    """
+    source_files = list_files if target.sources == "list" else common_files
+    extra_lines = element_lines if target.elements else []
+    compact_rules = opts.compact_rule_size if target.compact and opts.compact_ublockorigin else 0
+    formats = [replace(format_options, compact_rules=compact_rules) for format_options in target.formats]
+    create_nuclear = target.nuclear_engine is not None and opts.create_nuclear_list
+
+    exports = []
+    for format_options in formats:
+        exports.append((target.file_name.replace("{engine}", format_options.engine), source_files, format_options, extra_lines, [], False))
+
+    if create_nuclear:
+        for format_options in formats:
+            nuclear_format = replace(format_options, engine=target.nuclear_engine.replace("{engine}", format_options.engine))
+            exports.append(("Nuclear_" + target.file_name.replace("{engine}", format_options.engine), nuclear_files, nuclear_format, [], [], True))
+
+    if compact_rules > 0 and is_target_compiled(target):
+        # Rendered in one pass with every format's rule template, so engines can share rules.
+        # Named after all of its engines, like the exports `compile_files` joins each keep their own, so it doesn't repeat the compiled header's title
+        compiled_engine = ", ".join(format_options.engine for format_options in formats)
+        compiled_format = replace(formats[0], line_format="\n".join(format_options.line_format for format_options in formats), engine=compiled_engine)
+        # the same header `compile_files` puts above the joined exports
+        exports.append((target.compiled_file_name, source_files, compiled_format, extra_lines, [target.compiled_header + "\n"], False))
+
+        if create_nuclear and target.nuclear_compiled_header is not None:
+            nuclear_format = replace(compiled_format, engine=target.nuclear_engine.replace("{engine}", compiled_engine))
+            exports.append(("Nuclear_" + target.compiled_file_name, nuclear_files, nuclear_format, [], [target.nuclear_compiled_header + "\n"], True))
+
+    return exports
+
+def get_element_lines(element_files: list[str]) -> list[str]:
+    return LineRenderer(FormatOptions("{url}", "")).format_lines(read_element_lines(element_files))
+
+def get_stream_targets() -> dict[str, tuple[list[str], FormatOptions, list[str], list[str]]]:
+    """
+    :return: The source files, format, extra lines and header lines of each export `--stream` can write, keyed by the export's file name without its extension.
+    Every target can be streamed, enabled or not. The files joined by `compile_files` aren't included, they're the other exports one after another
+    """
+    common_files = get_files_sorted(opts.common_path)
+    list_files = common_files + get_files_sorted(opts.subpage_path)
+    nuclear_files = get_files_sorted(opts.nuclear_path)
+    element_lines = get_element_lines(get_files_sorted(opts.element_path))
+
+    return {
+        splitext(file_name)[0]: (input_file_paths, format_options, extra_lines, header_lines)
+        for target in format_targets
+        for file_name, input_file_paths, format_options, extra_lines, header_lines, _ in get_target_exports(target, common_files, list_files, nuclear_files, element_lines)
+    }
+
+def stream():
+    global stats
+    stats = build_stats.BuildStats(["stream"])
+
+    targets = get_stream_targets()
+    if opts.stream_target not in targets:
+        warnings.warn(f"Unknown export {opts.stream_target!r} for --stream, expected one of: {', '.join(targets)}")
+        return 2
+
+    input_file_paths, format_options, extra_lines, header_lines = targets[opts.stream_target]
+
+    try:
+        # closefd=False leaves stdout (or the caller's descriptor) open for the rest of the process
+        with open(opts.stream_fd, "wb", buffering=STREAM_BUFFER_SIZE, closefd=False) as output_file:
+            stream_formatted_lines(input_file_paths, format_options, output_file, extra_lines, header_lines)
+    except BrokenPipeError:
+        # the reader stopped early (e.g. `| head`), point the descriptor at devnull so nothing else fails writing to it on exit
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, opts.stream_fd)
+        os.close(devnull)
+        return 0
+
+    # stdout holds the list, so the report goes to stderr
+    if opts.stats:
+        print(stats.format_report(), file=sys.stderr)
+
+    if opts.trace_path:
+        stats.write_trace(opts.trace_path)
+
+    return 0
+
+# The parsed sources, set once in each worker process so they aren't pickled for every job
+_worker_parsed_files: dict[str, list[get_line_list.Section]] = {}
+
+_worker_stats_start: float | None = None
+
+def _init_render_worker(parsed_files: dict[str, list[get_line_list.Section]], stats_start: float):
+    global _worker_parsed_files, _worker_stats_start
+    _worker_parsed_files = parsed_files
+    _worker_stats_start = stats_start
+
+def _render_in_worker(input_file_paths: list[str], format_options: FormatOptions, extra_lines: list[str], reusable_chunks: dict[str, str], with_digests: bool, header_lines: list[str]) -> tuple[list[str], list[list], tuple]:
+    """
+    :return: The `render_formatted_lines` result, and the stages and trace events recorded while rendering, for `BuildStats.merge`
+    """
+    global stats
+    stats = build_stats.BuildStats(start_time=_worker_stats_start)
+
+    sources = get_parsed_sources(input_file_paths, _worker_parsed_files)
+    parts, chunks = render_formatted_lines(sources, format_options, extra_lines, reusable_chunks, with_digests, header_lines)
+
+    return parts, chunks, (stats.stages, stats.events)
+
+def write_outputs(outputs: list[tuple], parsed_files: dict[str, list[get_line_list.Section]], rendered_outputs: dict[str, list[str]] | None = None) -> list[bool]:
+    """
+    Render and write a batch of independent exports, concurrently when `--jobs` is above 1.
+    Files are written, and reported, in the order of `outputs` regardless of which finishes rendering first
+
+    :param list[tuple] outputs: The `(path, sources, format_options, extra_lines, header_lines)` arguments for each `try_write_to_path`
+    :param dict rendered_outputs: Filled with the rendered chunks of every file written, keyed by path
+    :return: The `try_write_to_path` result for each output
+    """
+    if opts.jobs <= 1:
+        return [try_write_to_path(*output, rendered_outputs=rendered_outputs) for output in outputs]
+
+    # imported here, the pools take longer to import than the rest of the script and most runs don't use them
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    results = [check_output_path(*output) for output in outputs]
+    pending = [result for result in results if isinstance(result, PendingOutput)]
+    with_digests = build_cache is not None
+
+    if opts.pool == "thread":
+        executor = ThreadPoolExecutor(max_workers=opts.jobs)
+        futures = [
+            executor.submit(render_formatted_lines, output.sources, output.format_options, output.extra_lines, output.reusable_chunks, with_digests, output.header_lines)
+            for output in pending
+        ]
+    else:
+        executor = ProcessPoolExecutor(max_workers=opts.jobs, initializer=_init_render_worker, initargs=(parsed_files, stats.start_time))
+        futures = [
+            executor.submit(_render_in_worker, list(output.sources), output.format_options, output.extra_lines, output.reusable_chunks, with_digests, output.header_lines)
+            for output in pending
+        ]
+
+    with executor:
+        rendered = iter(futures)
+        for i, result in enumerate(results):
+            if isinstance(result, PendingOutput):
+                parts, chunks, *worker_stats = next(rendered).result()
+                if worker_stats:
+                    stats.merge(*worker_stats[0])
+
+                results[i] = finish_output(result, parts, chunks, rendered_outputs)
+
+    return results
+
+def compile_files(input_file_paths: list[str], output_file: str, output_header: str, rendered_outputs: dict[str, list[str]] = {}) -> bool:
+    """
+    Join exported files together under `output_header`
+
+    :param dict rendered_outputs: The rendered chunks of exports written in this run. Only exports that were skipped as up to date are read back from disk
+    """
+    key = None
+    if build_cache is not None:
+        key = build_cache.get_compiled_key(input_file_paths, output_header)
+        if build_cache.is_up_to_date(output_file, key):
+            print(f"{output_file} is up to date, skipping")
+            return True
 
-def compile_files(input_file_paths: list[str], output_file: str, output_header: str) -> bool:
     if exists(output_file):
         if isdir(output_file):
             warnings.warn(f"Targeted path {output_file} is a directory, cancelling writing from {input_file_paths}")
             return False
 
-        if opts.overwrite:
-            remove(output_file)
-        else:
+        if not opts.overwrite:
             warnings.warn(f"Target file {output_file} exists and overwriting is disabled, skipping")
             return False
 
-    with open(output_file, "x", encoding="utf-8") as f:
-        f.write(output_header+'\n')
-        for path in input_file_paths:
-            if isfile(path):
-                with open(path, "rt", encoding="utf-8") as input_file:
-                    for line in input_file:
-                        f.write(line)
+    parts = [output_header + '\n']
+    for path in input_file_paths:
+        if path in rendered_outputs:
+            parts.extend(rendered_outputs[path])
+            parts.append('\n')
+
+        elif isfile(path):
+            with open(path, "rt", encoding="utf-8") as input_file:
+                # the compiled file gets a version line of its own
+                parts.append(release_artifacts.parse_version_line(input_file.read())[1])
+
+            parts.append('\n')
 
-                    f.write('\n')
+    if opts.patches:
+        parts = release_artifacts.add_version_line(parts)
+
+    report_write(write_parts(output_file, parts, "compile"), "compiled")
+
+    if build_cache is not None:
+        build_cache.record_output(output_file, key)
 
-    print(f"Successfully compiled {output_file}")
     return True
 
 def main():
-    global opts, args
+    global opts, args, build_cache, format_targets
     opts, args = get_opts()
 
-    common_files = get_files_sorted(opts.common_path)
-    subpage_files = get_files_sorted(opts.subpage_path)
-    nuclear_files = get_files_sorted(opts.nuclear_path)
-    element_files = get_files_sorted(opts.element_path)
+    try:
+        format_targets = export_formats.load_targets(opts.format_config)
+    except (OSError, ValueError) as e:
+        warnings.warn(f"Could not load the export formats from {opts.format_config}: {e}")
+        return 1
+
+    target_names = [target.name for target in format_targets]
+    for name in opts.targets + opts.skip_targets + opts.compile_targets + opts.skip_compile_targets:
+        if name not in target_names:
+            warnings.warn(f"Unknown target {name!r}, {opts.format_config} defines: {', '.join(target_names)}")
+
+    if opts.stream_target:
+        # a stream is rendered from scratch every time and leaves the export folder and build cache alone
+        run = stream
+        messages = sys.stderr
+    else:
+        run = generate
+        messages = sys.stdout
+
+        if opts.use_cache:
+            build_cache = build_cache_module.BuildCache(opts.cache_path)
+        elif opts.watch:
+            # rebuilds in watch mode always reuse the unchanged files and exports, without saving a manifest
+            build_cache = build_cache_module.BuildCache(None)
+
+    if opts.profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            result = run()
+        finally:
+            profiler.disable()
+            profiler.dump_stats(opts.profile_path)
+            print(f"Saved the profile to {opts.profile_path}", file=messages)
+    else:
+        result = run()
+
+    if opts.watch and not opts.stream_target:
+        watch()
+
+    return result
+
+def watch():
+    """
+    Regenerate the exports each time the source folders change, until interrupted.
+    The build cache keeps the parsed files in memory, so only changed files are parsed again and only the exports depending on them are rewritten
+    """
+    watched_paths = [opts.common_path, opts.subpage_path, opts.nuclear_path, opts.element_path]
+    watcher = source_watcher.get_watcher(watched_paths, opts.watch_poll_interval, opts.watch_poll)
+    print(f"Watching {', '.join(watched_paths)} for changes ({type(watcher).__name__}), press Ctrl+C to stop")
+
+    try:
+        while True:
+            changed = source_watcher.wait_for_changes(watcher, opts.watch_debounce)
+            print(f"Changed: {', '.join(sorted(changed))}")
+
+            start = time.perf_counter()
+            try:
+                generate()
+            except Exception as e:
+                # keep watching, the next save may fix it. Printed rather than warned, so the same failure is shown on every rebuild
+                print(f"Regenerating failed: {e!r}", file=sys.stderr)
+                continue
+            print(f"Regenerated in {(time.perf_counter() - start) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+def generate():
+    global stats
+    stats = build_stats.BuildStats(STAGES)
+    write_results.clear()
+
+    with stats.stage("get_files"):
+        common_files = get_files_sorted(opts.common_path)
+        subpage_files = get_files_sorted(opts.subpage_path)
+        nuclear_files = get_files_sorted(opts.nuclear_path)
+        element_files = get_files_sorted(opts.element_path)
+
+    # Every format is rendered from this single parse of the inputs
+    parsed_files = parse_files(common_files + subpage_files + nuclear_files, opts.validate)
 
     if isfile(opts.output_path):
         warnings.warn(f"Output path {opts.output_path} is a file, not a directiory. Cancelling operations")
-        return
+        return 1
 
     if not exists(opts.output_path):
         makedirs(opts.output_path)
 
-    if opts.create_ublockorigin:
-        # TODO: move this into the arguments
-        ublock_formats = {
-            "google": 'google.com##a[href*="{url}"]:upward(2):remove()',
-            "duckduckgo": 'duckduckgo.com##a[href*="{url}"]:upward(figure):upward(1):remove()',
-            "bing": 'bing.com##a[href*="{url}"]:upward(li):remove()',
-        }
+    # Every independent export is collected first, then written together so they can be rendered in parallel
+    outputs = []
+    # the exports each compiled file joins together: (path, header, export paths)
+    compiled_outputs = []
+    element_lines = get_element_lines(element_files)
 
-        format_options = FormatOptions("", "")
-        element_format = FormatOptions("{url}", "")
+    for target in format_targets:
+        if not is_target_enabled(target):
+            continue
 
-        written_files = []
-        written_files_nuclear = []
+        export_paths = []
+        nuclear_export_paths = []
 
-        for engine, line_format in ublock_formats.items():
-            format_options.line_format = line_format
-            format_options.engine = engine
+        for file_name, input_file_paths, format_options, extra_lines, header_lines, nuclear in get_target_exports(target, common_files, common_files + subpage_files, nuclear_files, element_lines):
+            target_path = join(opts.output_path, file_name)
+            outputs.append((target_path, get_parsed_sources(input_file_paths, parsed_files), format_options, extra_lines, header_lines))
+            (nuclear_export_paths if nuclear else export_paths).append(target_path)
 
-            target_path = join(opts.output_path, format_options.engine + "-list_uBlockOrigin.txt")
+        if is_target_compiled(target) and not (target.compact and opts.compact_ublockorigin):
+            compiled_outputs.append((join(opts.output_path, target.compiled_file_name), target.compiled_header, export_paths))
 
-            was_file_written = try_write_to_path(
-                target_path,
-                common_files + subpage_files,
-                format_options
-            )
+            if opts.create_nuclear_list and target.nuclear_engine is not None and target.nuclear_compiled_header is not None:
+                compiled_outputs.append((join(opts.output_path, "Nuclear_" + target.compiled_file_name), target.nuclear_compiled_header, nuclear_export_paths))
 
-            if was_file_written:
-                # Append extra elements to ublock format
-                with open(target_path, "a", encoding="utf-8") as f:
-                    for file in element_files:
-                        with open(file, "rt", encoding="utf-8") as r:
-                            for line in r:
-                                f.write(format_line(line, element_format))
-
-                written_files.append(target_path)
-
-        if opts.create_nuclear_list:
-            for engine, line_format in ublock_formats.items():
-                format_options.line_format = line_format
-                format_options.engine = engine + " (Nuclear)"
-
-                target_path = join(opts.output_path, "Nuclear_" + engine + "-list_uBlockOrigin.txt")
-
-                was_file_written = try_write_to_path(target_path, nuclear_files, format_options)
-
-                if was_file_written:
-                    written_files_nuclear.append(target_path)
-
-        # grab all the written files and add them together
-        if opts.compile_ublockorigin:
-            target_path = join(opts.output_path, "list_uBlockOrigin.txt")
-            compile_files(written_files, target_path, "! Title: Huge AI Blocklist (Compiled)\n")
-
-            if opts.create_nuclear_list:
-                target_path = join(opts.output_path, "Nuclear_list_uBlockOrigin.txt")
-                compile_files(written_files, target_path, "! Title: Huge AI Blocklist (Nuclear) (Compiled)\n")
-
-    if opts.create_ublacklist:
-        # TODO: move this into the arguments
-        ublacklist_format = FormatOptions(
-            line_format='*://*{url}*',
-            engine="uBlacklist",
-            comment_replacement="#",
-            apply_prefix=True,
-            line_prefix_to_apply=".",
-            apply_suffix=True,
-            line_suffix_to_apply="/"
-        )
+    rendered_outputs = {}
+    was_file_written = dict(zip(
+        [output[0] for output in outputs],
+        write_outputs(outputs, parsed_files, rendered_outputs)
+    ))
 
-        target_path = join(opts.output_path, "list_uBlacklist.txt")
+    finished_paths = [path for path, written in was_file_written.items() if written]
 
-        was_file_written = try_write_to_path(
-            target_path,
-            common_files + subpage_files,
-            ublacklist_format
-        )
+    # grab all the written files and add them together
+    for target_path, output_header, export_paths in compiled_outputs:
+        written_files = [path for path in export_paths if was_file_written[path]]
 
-        if opts.create_nuclear_list:
-            target_path = join(opts.output_path, "Nuclear_list_uBlacklist.txt")
-
-            was_file_written = try_write_to_path(target_path, nuclear_files, ublacklist_format)
-
-    if opts.create_hosts:
-        hosts_formats = [
-            FormatOptions(
-                line_format='0.0.0.0 {url}',
-                engine='hosts',
-                comment_replacement="#",
-                hosts_mode=True
-            ),
-            FormatOptions(
-                line_format='0.0.0.0 www{url}',
-                engine='hosts-www',
-                comment_replacement="#",
-                apply_prefix=True,
-                line_prefix_to_apply='.',
-                hosts_mode=True
-            )
-        ]
+        if compile_files(written_files, target_path, output_header, rendered_outputs):
+            finished_paths.append(target_path)
+
+    if opts.compress:
+        write_compressed(finished_paths)
 
-        written_files = []
+    if len(write_results) > 0:
+        print(output_writer.summarise(write_results))
 
-        for format_option in hosts_formats:
-            target_path = join(opts.output_path, format_option.engine + ".txt")
+    if opts.stats:
+        print(stats.format_report())
 
-            was_file_written = try_write_to_path(target_path, common_files, format_option)
-            if was_file_written:
-                written_files.append(target_path)
+    if opts.trace_path:
+        stats.write_trace(opts.trace_path)
+        print(f"Saved the stage timeline to {opts.trace_path}")
 
-        if opts.compile_hosts:
-            target_path = join(opts.output_path, "list_hosts.txt")
-            compile_files(written_files, target_path, "# Title: Huge AI Blocklist (Compiled)\n")
+    if build_cache is not None:
+        build_cache.save()
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
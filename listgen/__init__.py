@@ -0,0 +1,6 @@
+"""
+A quick entry point for `list_generator.py`, for running on every commit from `.githooks/pre-commit`: `python -m listgen [options]`
+
+Takes the same options as `list_generator.py`. When nothing it reads or writes has changed since the last run with the same options,
+it returns without importing the generator
+"""
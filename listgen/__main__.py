@@ -0,0 +1,44 @@
+import os
+import sys
+from listgen import stamp
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# next to the build cache, in the folder the exports are built from
+STAMP_PATH = ".listgen_stamp"
+
+def get_code_paths() -> list[str]:
+    return sorted(entry.path for entry in os.scandir(REPO_ROOT) if entry.name.endswith(".py"))
+
+def main() -> int:
+    argv = sys.argv[1:]
+
+    # the whole check only needs `os`: no option parsing, and none of the generator's modules
+    if stamp.is_unchanged(STAMP_PATH, argv):
+        print("Nothing changed since the last build, skipping")
+        return 0
+
+    sys.path.insert(0, REPO_ROOT)
+    import list_generator
+
+    opts, _ = list_generator.get_opts()
+
+    # only plain builds are recorded, anything else (such as --stats or --watch) always runs
+    recorded = opts.use_cache and not (opts.watch or opts.stream_target or opts.profile_path or opts.stats or opts.trace_path)
+
+    input_paths = [opts.common_path, opts.subpage_path, opts.nuclear_path, opts.element_path, opts.format_config, *get_code_paths()]
+    input_lines = stamp.scan(input_paths) if recorded else []
+
+    # a failed build can't leave the stamp of the last one behind
+    if recorded:
+        stamp.remove_stamp(STAMP_PATH)
+
+    result = list_generator.main()
+
+    if recorded and not result:
+        stamp.write_stamp(STAMP_PATH, argv, input_paths, [opts.output_path], input_lines)
+
+    return result
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+The record of a finished build: the command line it ran with, and the mtime and size of every file it read or wrote.
+Only uses `os`, so checking it costs a `stat` per file and nothing else
+"""
+import os
+
+STAMP_VERSION = "listgen stamp 1"
+
+def scan(paths: list[str]) -> list[str]:
+    """
+    :return: A `"{mtime_ns} {size} {path}"` line for each file in `paths`, and in the folders in `paths` and their subfolders, sorted
+    """
+    lines = []
+    folders = []
+
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            lines.append(f"missing {path}")
+            continue
+
+        if os.path.isdir(path):
+            folders.append(path)
+        else:
+            lines.append(f"{stat.st_mtime_ns} {stat.st_size} {path}")
+
+    while folders:
+        with os.scandir(folders.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    folders.append(entry.path)
+                else:
+                    stat = entry.stat()
+                    lines.append(f"{stat.st_mtime_ns} {stat.st_size} {entry.path}")
+
+    lines.sort()
+    return lines
+
+def format_stamp(argv: list[str], input_paths: list[str], output_paths: list[str], input_lines: list[str], output_lines: list[str]) -> str:
+    return "\n".join([
+        STAMP_VERSION,
+        "\0".join(argv),
+        "\0".join(input_paths),
+        "\0".join(output_paths),
+        *input_lines,
+        "",
+        *output_lines,
+    ]) + "\n"
+
+def is_unchanged(stamp_path: str, argv: list[str]) -> bool:
+    """
+    :return: Whether the stamp at `stamp_path` was written by a run with exactly `argv`, and every file it lists is unchanged
+    """
+    try:
+        with open(stamp_path, "r", encoding="utf-8") as f:
+            stamp = f.read()
+    except OSError:
+        return False
+
+    lines = stamp.split("\n", 4)
+    if len(lines) < 5 or lines[0] != STAMP_VERSION or lines[1] != "\0".join(argv):
+        return False
+
+    input_paths = lines[2].split("\0") if lines[2] else []
+    output_paths = lines[3].split("\0") if lines[3] else []
+
+    return stamp == format_stamp(argv, input_paths, output_paths, scan(input_paths), scan(output_paths))
+
+def write_stamp(stamp_path: str, argv: list[str], input_paths: list[str], output_paths: list[str], input_lines: list[str]):
+    """
+    :param list[str] input_lines: The `scan` of `input_paths` from before the build, so files edited while it ran are seen as changed next time
+    """
+    stamp = format_stamp(argv, input_paths, output_paths, input_lines, scan(output_paths))
+
+    temp_path = stamp_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(stamp)
+    os.replace(temp_path, stamp_path)
+
+def remove_stamp(stamp_path: str):
+    try:
+        os.remove(stamp_path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,80 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from os.path import basename, dirname, getsize, isfile, join
+
+@dataclass
+class WriteResult:
+    """
+    :param str path: The file that was written
+    :param int size: The size of the rendered file in bytes
+    :param bool written: `False` if the file already had exactly this content and was left alone
+    """
+    path: str
+    size: int
+    written: bool
+
+def encode_parts(parts: list[str]) -> bytes:
+    # matches what a text-mode file would have written on this platform
+    text = "".join(parts)
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+
+    return text.encode("utf-8")
+
+def file_matches(path: str, data: bytes) -> bool:
+    if not isfile(path) or getsize(path) != len(data):
+        return False
+
+    digest = hashlib.blake2b(data).digest()
+    file_hash = hashlib.blake2b()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            file_hash.update(chunk)
+
+    return file_hash.digest() == digest
+
+def write_atomic(path: str, data: bytes):
+    """
+    Write `data` to a temporary file next to `path` and move it over `path`,
+    so readers only ever see the old file or the complete new one
+    """
+    temp_path = join(dirname(path), f".{basename(path)}.{os.getpid()}.tmp")
+
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+
+        if isfile(path):
+            os.chmod(temp_path, os.stat(path).st_mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if isfile(temp_path):
+            os.remove(temp_path)
+        raise
+
+def write_if_changed(path: str, parts: list[str]) -> WriteResult:
+    """
+    Write the rendered `parts` to `path` in one go, unless `path` already holds exactly that content
+    """
+    data = encode_parts(parts)
+
+    if file_matches(path, data):
+        return WriteResult(path, len(data), False)
+
+    write_atomic(path, data)
+    return WriteResult(path, len(data), True)
+
+def format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    return f"{size / 1024:.1f} KiB"
+
+def summarise(results: list[WriteResult]) -> str:
+    written = [result for result in results if result.written]
+    skipped = [result for result in results if not result.written]
+
+    return (
+        f"Wrote {format_size(sum(result.size for result in written))} to {len(written)} files, "
+        f"skipped {format_size(sum(result.size for result in skipped))} in {len(skipped)} unchanged files"
+    )
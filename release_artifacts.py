@@ -0,0 +1,166 @@
+import difflib
+import gzip
+import hashlib
+import os
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from os.path import basename, getmtime, isfile, join, splitext
+import output_writer
+
+try:
+    import zstandard
+except ImportError: # optional, `pip install zstandard`
+    zstandard = None
+
+try:
+    import brotli
+except ImportError: # optional, `pip install brotli`
+    brotli = None
+
+VERSION_PATTERN = re.compile(r"[!#] Version: ([0-9a-f]+)\n")
+
+@dataclass
+class Compressor:
+    """
+    :param str name: The name of the format, such as `"gzip"`
+    :param str extension: Added to the export's file name, such as `".gz"`
+    :param Callable compress: Compresses a whole file. The output must only depend on the input, so unchanged exports compress to unchanged artifacts
+    """
+    name: str
+    extension: str
+    compress: Callable[[bytes], bytes]
+
+def get_compressors() -> list[Compressor]:
+    """
+    :return: gzip, and zstd and brotli when their modules are installed
+    """
+    # mtime=0 leaves the build time out of the gzip header
+    compressors = [Compressor("gzip", ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+
+    if zstandard is not None:
+        compressors.append(Compressor("zstd", ".zst", zstandard.ZstdCompressor(level=19).compress))
+
+    if brotli is not None:
+        compressors.append(Compressor("brotli", ".br", lambda data: brotli.compress(data, quality=11)))
+
+    return compressors
+
+def write_compressed(path: str, compressor: Compressor) -> output_writer.WriteResult | None:
+    """
+    Write `path` compressed next to it, unless the artifact is already newer than `path`
+
+    :return: `None` if the artifact was up to date
+    """
+    artifact_path = path + compressor.extension
+    if isfile(artifact_path) and getmtime(artifact_path) >= getmtime(path):
+        return None
+
+    with open(path, "rb") as f:
+        data = compressor.compress(f.read())
+
+    output_writer.write_atomic(artifact_path, data)
+    return output_writer.WriteResult(artifact_path, len(data), True)
+
+def get_version(text: str) -> str:
+    return hashlib.blake2b(output_writer.encode_parts([text]), digest_size=8).hexdigest()
+
+def add_version_line(parts: list[str]) -> list[str]:
+    """
+    Put a `Version:` line, the checksum of the rest of the file, in front of the rendered `parts`.
+    It uses the comment character of the file's first line, so it reads as part of the header
+
+    :return: A new list of parts, with the version line as the first part
+    """
+    comment_prefix = "#" if len(parts) > 0 and parts[0].startswith("#") else "!"
+    return [f"{comment_prefix} Version: {get_version(''.join(parts))}\n"] + parts
+
+def parse_version_line(text: str) -> tuple[str | None, str]:
+    """
+    :return: The version of a file written with `add_version_line`, and its text without the version line. The version is `None` for files without one
+    """
+    match = VERSION_PATTERN.match(text)
+    if match is None:
+        return None, text
+
+    return match[1], text[match.end():]
+
+def make_patch(name: str, previous_text: str, text: str) -> tuple[str, str] | None:
+    """
+    Diff two versioned builds of the same export, as a `diff -n` (RCS) style patch under a
+    `diff name:{name} from:{version} to:{version} lines:{count}` line, where `lines` counts the patch lines after it
+
+    :return: The version the patch applies to and the patch, `None` if `previous_text` has no version line
+    """
+    previous_version, _ = parse_version_line(previous_text)
+    version, _ = parse_version_line(text)
+    if previous_version is None or version is None:
+        return None
+
+    previous_lines = previous_text.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+
+    commands = []
+    matcher = difflib.SequenceMatcher(None, previous_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("delete", "replace"):
+            commands.append(f"d{i1 + 1} {i2 - i1}\n")
+        if tag in ("insert", "replace"):
+            commands.append(f"a{i2} {j2 - j1}\n")
+            commands.extend(lines[j1:j2])
+
+    patch = f"diff name:{name} from:{previous_version} to:{version} lines:{len(commands)}\n" + "".join(commands)
+    return previous_version, patch
+
+def apply_patch(previous_text: str, patch: str) -> str:
+    """
+    Apply a patch from `make_patch` to the build it was made from, the way a client updating its copy would
+    """
+    previous_lines = previous_text.splitlines(keepends=True)
+    patch_lines = patch.splitlines(keepends=True)
+
+    lines = []
+    position = 0 # lines of previous_lines used so far
+    i = 1 # skip the `diff` line
+
+    while i < len(patch_lines):
+        command, count = patch_lines[i][1:].split()
+        line_number = int(command)
+        count = int(count)
+
+        if patch_lines[i][0] == "d":
+            lines.extend(previous_lines[position:line_number - 1])
+            position = line_number - 1 + count
+            i += 1
+        else:
+            lines.extend(previous_lines[position:line_number])
+            position = max(position, line_number)
+            lines.extend(patch_lines[i + 1:i + 1 + count])
+            i += 1 + count
+
+    lines.extend(previous_lines[position:])
+    text = "".join(lines)
+
+    version, body = parse_version_line(text)
+    if version is None or version != get_version(body):
+        raise ValueError("Patched text doesn't match its version line")
+
+    return text
+
+def get_patch_path(folder: str, path: str, version: str) -> str:
+    return join(folder, f"{splitext(basename(path))[0]}.{version}.patch")
+
+def prune_patches(folder: str, path: str, keep: int) -> list[str]:
+    """
+    Remove all but the `keep` newest patches of the export at `path`
+
+    :return: The removed patch paths
+    """
+    pattern = re.compile(re.escape(splitext(basename(path))[0]) + r"\.[0-9a-f]+\.patch")
+    patch_paths = [join(folder, name) for name in os.listdir(folder) if pattern.fullmatch(name)]
+    patch_paths.sort(key=getmtime, reverse=True)
+
+    for patch_path in patch_paths[keep:]:
+        os.remove(patch_path)
+
+    return patch_paths[keep:]
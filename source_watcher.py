@@ -0,0 +1,167 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from os.path import isdir, isfile, join
+
+# inotify event flags, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+EVENT_HEADER = struct.Struct("iIII")
+
+class InotifyWatcher:
+    """
+    Watches files and folders (recursively) for changes with Linux inotify, through libc
+    """
+
+    def __init__(self, paths: list[str]):
+        libc_name = ctypes.util.find_library("c")
+        if sys.platform != "linux" or libc_name is None:
+            raise OSError("inotify is only available on Linux")
+
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.watches: dict[int, str] = {}
+        for path in paths:
+            self.add_watch(path)
+
+    def add_watch(self, path: str):
+        if isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                self._add_single_watch(dirpath)
+        elif isfile(path):
+            self._add_single_watch(path)
+
+    def _add_single_watch(self, path: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self.watches[wd] = path
+
+    def read_changes(self, timeout: float | None) -> set[str]:
+        """
+        Wait up to `timeout` seconds (forever if `None`) for events
+
+        :return: The paths that changed. Empty if nothing happened before the timeout
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b"\0").decode("utf-8", "replace")
+            offset += name_length
+
+            path = self.watches.get(wd)
+            if path is None:
+                continue
+            if name:
+                path = join(path, name)
+
+            # new folders need their own watch to see the files created in them
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self.add_watch(path)
+
+            changed.add(path)
+
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """
+    Watches files and folders (recursively) for changes by comparing the mtime and size of every file on an interval.
+    Used where inotify isn't available
+    """
+
+    def __init__(self, paths: list[str], interval: float = 0.5):
+        self.paths = paths
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for path in self.paths:
+            files = [path] if isfile(path) else [
+                join(dirpath, f)
+                for dirpath, dirnames, filenames in os.walk(path)
+                for f in filenames
+            ]
+            for file in files:
+                try:
+                    file_stat = os.stat(file)
+                except OSError:
+                    continue
+                snapshot[file] = (file_stat.st_mtime_ns, file_stat.st_size)
+
+        return snapshot
+
+    def read_changes(self, timeout: float | None) -> set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            wait = self.interval if deadline is None else min(self.interval, max(0, deadline - time.monotonic()))
+            time.sleep(wait)
+
+            snapshot = self.scan()
+            changed = {
+                path
+                for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+def get_watcher(paths: list[str], poll_interval: float = 0.5, use_polling: bool = False) -> InotifyWatcher | PollingWatcher:
+    paths = [path for path in paths if isdir(path) or isfile(path)]
+
+    if not use_polling:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass
+
+    return PollingWatcher(paths, poll_interval)
+
+def wait_for_changes(watcher: InotifyWatcher | PollingWatcher, debounce: float) -> set[str]:
+    """
+    Block until something changes, then keep collecting changes until none arrive for `debounce` seconds,
+    so a burst of saves triggers a single rebuild
+
+    :return: Every path that changed during the burst
+    """
+    changed = watcher.read_changes(None)
+
+    while True:
+        more_changes = watcher.read_changes(debounce)
+        if not more_changes:
+            return changed
+        changed |= more_changes
@@ -0,0 +1,217 @@
+import argparse as arg
+import re
+import sys
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+import get_line_list
+import output_writer
+
+# Longest hostname DNS allows, without the trailing period
+MAX_HOSTNAME_LENGTH = 253
+
+HOSTNAME_LABEL = r"[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?"
+# An entry's hostname, with the optional leading `.` that keeps it from matching the end of a longer domain
+HOSTNAME_PATTERN = re.compile(rf"\.?(?:{HOSTNAME_LABEL}\.)*{HOSTNAME_LABEL}", re.ASCII)
+
+# `"` ends the `a[href*="{url}"]` selectors and `\` escapes in them, whitespace splits hosts lines
+BREAKING_CHARACTER_PATTERN = re.compile(r'["\\\s]')
+
+# Lines that are already valid and normalised, so need no further checks. A label is one greedy run with a lookbehind for its last character,
+# as nearly every entry goes through these. (Possessive quantifiers would save the backtracking, but need Python 3.11)
+# Under `! domains=[...]`, entries are paths added to each domain instead of hostnames
+FAST_HOSTNAME_LABEL = r"[a-z0-9](?:[a-z0-9-]{0,62}(?<!-))?"
+VALID_ENTRY_PATTERN = re.compile(rf'\.?(?:{FAST_HOSTNAME_LABEL}\.)*{FAST_HOSTNAME_LABEL}(?:/[^"\\\s]*)?\n', re.ASCII)
+VALID_PATH_PATTERN = re.compile(r'[^"\\\s]+\n')
+# Longer lines could have too long a hostname, so they're always checked in full
+MAX_VALID_LINE_LENGTH = MAX_HOSTNAME_LENGTH + 2
+
+# Problems that the normalised entries don't have
+FIXED_KINDS = ("whitespace", "uppercase", "duplicate")
+
+@dataclass
+class Problem:
+    """
+    :param str kind: `"whitespace"`, `"uppercase"` or `"duplicate"`, which normalising the entry fixes,
+        or `"hostname"` or `"character"`, which have to be fixed by hand
+    """
+    path: str
+    line_number: int
+    kind: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line_number}: {self.message}"
+
+class EntryValidator:
+    """
+    Checks and normalises the entries of source files in the same single pass that splits them into sections.
+    Entries matching the precompiled pattern of a valid, normalised entry (nearly all of them) skip the separate checks,
+    and are passed on without being copied
+    """
+
+    def __init__(self):
+        self.problems: list[Problem] = []
+        self.entry_count = 0
+
+    def add_problems(self, path: str, problems: list[list]):
+        """
+        Add problems saved with `[line_number, kind, message]`, such as ones from the build cache for an unchanged file
+        """
+        self.problems.extend(Problem(path, *problem) for problem in problems)
+
+    def normalise_entry(self, path: str, line_number: int, line: str, is_path: bool) -> str:
+        """
+        :param bool is_path: Whether the entry is a path under a `! domains=[...]` comment, rather than a hostname with an optional path
+        :return: The entry without surrounding whitespace and with a lowercase hostname, ending in a newline.
+            `"\\n"` for a line of only whitespace
+        """
+        text = line.strip()
+        if text != line.removesuffix("\n"):
+            if text == "":
+                self.problems.append(Problem(path, line_number, "whitespace", "Line only has whitespace"))
+                return "\n"
+            self.problems.append(Problem(path, line_number, "whitespace", f"'{text}' has leading or trailing whitespace"))
+
+        host, slash, rest = ("", "", text) if is_path else text.partition("/")
+        if host != host.lower():
+            self.problems.append(Problem(path, line_number, "uppercase", f"'{text}' has uppercase letters in its hostname"))
+            host = host.lower()
+
+        match = BREAKING_CHARACTER_PATTERN.search(text)
+        if match is not None:
+            self.problems.append(Problem(path, line_number, "character", f"'{text}' has {match[0]!r}, which breaks the exported selectors and hosts lines"))
+
+        if not is_path and (len(host.lstrip(".")) > MAX_HOSTNAME_LENGTH or not HOSTNAME_PATTERN.fullmatch(host)):
+            self.problems.append(Problem(path, line_number, "hostname", f"'{text}' doesn't start with a valid hostname"))
+
+        return host + slash + rest + "\n"
+
+    def iter_checked_lines(self, path: str, lines: Iterable[str], config: get_line_list.LineConfig) -> Iterator[str]:
+        """
+        Yield `lines` with every entry normalised, and without entries that repeat an earlier one in the same section.
+        Lines are classified the same way as in `get_line_list.iter_section_chunks`, and problems are added to `self.problems`
+
+        :param str path: The file the lines are from, for the problems
+        """
+        # the normalised entries of the current section
+        seen: set[str] = set()
+        has_entries = False
+        is_valid = VALID_ENTRY_PATTERN.fullmatch
+        is_path = False
+
+        for line_number, line in enumerate(lines, 1):
+            if line.startswith(config.header_prefix):
+                if has_entries:
+                    seen = set()
+                    has_entries = False
+                    is_valid = VALID_ENTRY_PATTERN.fullmatch
+                    is_path = False
+
+                yield line
+                continue
+
+            if line.startswith(config.comment_prefix):
+                if not has_entries and get_line_list.parse_domains(line):
+                    is_valid = VALID_PATH_PATTERN.fullmatch
+                    is_path = True
+
+                yield line
+                continue
+
+            if line == "\n":
+                yield line
+                continue
+
+            self.entry_count += 1
+            if len(line) > MAX_VALID_LINE_LENGTH or not is_valid(line):
+                line = self.normalise_entry(path, line_number, line, is_path)
+                if line == "\n":
+                    yield line
+                    continue
+
+            if line in seen:
+                self.problems.append(Problem(path, line_number, "duplicate", f"'{line.rstrip()}' is already in this section"))
+                continue
+            seen.add(line)
+
+            has_entries = True
+            yield line
+
+    def get_sections(self, path: str, lines: Iterable[str], config: get_line_list.LineConfig) -> list[get_line_list.Section]:
+        """
+        Split the lines of `path` into sections like `get_line_list.get_sections`, with the entries checked and normalised
+        """
+        return get_line_list.get_sections(self.iter_checked_lines(path, lines, config), config)
+
+    def parse_file(self, path: str, config: get_line_list.LineConfig) -> list[get_line_list.Section]:
+        return self.get_sections(path, get_line_list.iter_file_lines(path), config)
+
+def normalise_file(validator: EntryValidator, path: str, config: get_line_list.LineConfig, write: bool) -> bool:
+    """
+    Check the entries of `path`, and with `write`, replace it with its normalised lines
+
+    :return: Whether normalising changed the file
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    normalised = output_writer.encode_parts(list(validator.iter_checked_lines(path, get_line_list.iter_buffer_lines(data), config)))
+    if normalised == data:
+        return False
+
+    if write:
+        output_writer.write_atomic(path, normalised)
+
+    return True
+
+def get_args() -> arg.Namespace:
+    parser = arg.ArgumentParser(description="Check the entries of the source lists for invalid hostnames, characters that break the exported rules, stray whitespace, uppercase hostnames and duplicates within a section")
+
+    parser.add_argument(
+        "paths", nargs="*", default=["Common", "SubPages", "Nuclear"],
+        help='Files or folders to check. Default = Common SubPages Nuclear')
+    parser.add_argument(
+        "--fix", action="store_true",
+        help="Rewrite the source files with their entries normalised: trimmed, with lowercase hostnames, and without duplicates within a section. "
+             "Invalid hostnames and characters still have to be fixed by hand")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Exit with status 1 if any problem is left")
+
+    return parser.parse_args()
+
+def main() -> int:
+    args = get_args()
+
+    config = get_line_list.LineConfig()
+    validator = EntryValidator()
+    changed_files = []
+    file_count = 0
+
+    for input_path in args.paths:
+        for path in get_line_list.get_input_files(input_path):
+            file_count += 1
+            if normalise_file(validator, path, config, args.fix):
+                changed_files.append(path)
+
+    for problem in validator.problems:
+        print(problem)
+
+    counts = {kind: 0 for kind in FIXED_KINDS + ("hostname", "character")}
+    for problem in validator.problems:
+        counts[problem.kind] += 1
+
+    print(f"Checked {validator.entry_count} entries in {file_count} files: " + ", ".join(f"{count} {kind}" for kind, count in counts.items()))
+
+    if args.fix:
+        for path in changed_files:
+            print(f"Normalised {path}")
+
+    remaining = [problem for problem in validator.problems if not (args.fix and problem.kind in FIXED_KINDS)]
+    if args.check and len(remaining) > 0:
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())